@@ -0,0 +1,91 @@
+"""
+Compares utils.hashing with the previous hashing loops.
+
+    python benchmarks/bench_hashing.py [--size-mb 512] [--files 4]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "lsslauncher"))
+
+from utils.hashing import hash_file, hash_files  # noqa: E402
+
+
+def legacy_sha1_crc32(path):
+    """dota_patcher.calculate_hashes before the shared engine (4 KB reads)."""
+    sha1 = hashlib.sha1()
+    crc32 = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(4096):
+            sha1.update(chunk)
+            crc32 = zlib.crc32(chunk, crc32)
+    return sha1.hexdigest(), crc32 & 0xFFFFFFFF
+
+
+def legacy_md5(path):
+    """API._check_md5 before the shared engine (8 KB reads)."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def timed(label, size, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f} s {size / elapsed / 1024**2:10.1f} MB/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--files", type=int, default=4)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = Path(tmp) / f"pack{i}.vpk"
+            with open(path, "wb") as f:
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            paths.append(path)
+        first = paths[0]
+
+        # Warm the page cache so every run measures hashing, not the disk
+        hash_file(first, ("md5",))
+
+        print(f"Single file, {args.size_mb} MB")
+        sha1, crc = timed("legacy sha1+crc32 (4 KB)", size, legacy_sha1_crc32, first)
+        new = timed("hash_file sha1+crc32", size, hash_file, first, ("sha1", "crc32"))
+        assert new["sha1"] == sha1 and int(new["crc32"], 16) == crc
+
+        md5 = timed("legacy md5 (8 KB)", size, legacy_md5, first)
+        new = timed("hash_file md5", size, hash_file, first, ("md5",))
+        assert new["md5"] == md5
+
+        timed("legacy md5 + sha1 + crc32 (3 passes)", size, lambda: (
+            legacy_md5(first), legacy_sha1_crc32(first)
+        ))
+        timed("hash_file md5+sha1+crc32 (1 pass)", size, hash_file, first, (
+            "md5", "sha1", "crc32"
+        ))
+
+        total = size * len(paths)
+        print(f"\n{len(paths)} files, {args.size_mb} MB each")
+        timed("legacy md5, sequential", total, lambda: [legacy_md5(p) for p in paths])
+        timed("hash_files md5, thread pool", total, hash_files, paths, ("md5",))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 import threading
 import time
 import webbrowser
-from typing import Any, Dict, List
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
 
 import webview
+from loguru import logger
+from utils.api import API, APP_DATA_PATH
+from utils.catalog import Catalog
+from utils.catalog_cache import CatalogCache
+from utils.download_manager import DownloadJob, JobState
+from utils.gameinfo_cache import get_default_gameinfo
+from utils.helpers import get_uuid_file
+from utils.pack_store import get_pack_store
+from utils.process_watcher import get_process_watcher
+from utils.task_watcher import TaskWatcher
+from utils.vpk import VPKError, merge_vpks
 from webview.window import Window
 
 
@@ -12,11 +24,35 @@ class PyWebAPI:
         self.logged_in = False
         self.favorites = set()
         self.installed_packs = set()
+        self.api = API()
+        self.catalog_cache = CatalogCache(self.api)
+        # Start from the cached catalog, swap in fresh data once synced
+        self.catalog = Catalog(self.catalog_cache.get_files())
+        self.catalog_cache.refresh_async().add_done_callback(
+            lambda _: self.catalog.load(self.catalog_cache.get_files(), self.favorites)
+        )
+        self.downloads: Dict[str, DownloadJob] = {}
+        self.task_watcher = TaskWatcher(self.api)
+        # Have the default gi ready before the first patch needs it
+        get_default_gameinfo().refresh_async()
+        self.process_watcher = get_process_watcher()
+        self.process_watcher.subscribe(self._on_game_state)
+        self.process_watcher.start()
 
     # =====================
     # GENERAL
     # =====================
 
+    def _on_game_state(self, running: bool, pid: Optional[int]):
+        window = webview.active_window()
+        if window:
+            window.evaluate_js(
+                f"window.__lsslauncher_on_game_state?.({str(running).lower()})"
+            )
+
+    def is_game_running(self) -> bool:
+        return self.process_watcher.is_running()
+
     def get_about_data(self):
         return {
             "appName": "LSS Launcher",
@@ -82,22 +118,27 @@ class PyWebAPI:
     # =====================
 
     def get_shop_items(self):
-        return [
-            {
-                "id": "visual_pack_1",
-                "name": "Ultra Visuals",
-                "size": "250 MB",
-                "category": "visual",
-                "isFavorite": False,
-            },
-            {
-                "id": "audio_pack_1",
-                "name": "Immersive Sounds",
-                "size": "120 MB",
-                "category": "audio",
-                "isFavorite": True,
-            },
-        ]
+        return self.catalog.query(limit=len(self.catalog))["items"]
+
+    def query_shop_items(
+        self,
+        search: str = "",
+        category: Optional[str] = None,
+        favoritesOnly: bool = False,
+        sort: str = "name",
+        descending: bool = False,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        return self.catalog.query(
+            search=search,
+            category=category,
+            favorites_only=favoritesOnly,
+            sort=sort,
+            descending=descending,
+            offset=offset,
+            limit=limit,
+        )
 
     def get_installed_packs(self) -> List[str]:
         return list(self.installed_packs)
@@ -129,12 +170,71 @@ class PyWebAPI:
     # =====================
 
     def start_mix(self, mainId: str, subId: str):
-        def worker():
-            time.sleep(3)
+        def on_done(future: Future):
+            if future.exception():
+                webview.active_window().evaluate_js(
+                    "window.__lsslauncher_on_mix_error?.()"
+                )
+                return
             webview.active_window().evaluate_js(
                 f'window.__lsslauncher_on_mix_ready?.("merge")'
             )
 
+        def merge_locally() -> bool:
+            main_path = APP_DATA_PATH / get_uuid_file(mainId)
+            sub_path = APP_DATA_PATH / get_uuid_file(subId)
+            if not (main_path.exists() and sub_path.exists()):
+                return False
+
+            last_percent = -1
+
+            def on_progress(written: int, total: int):
+                nonlocal last_percent
+                # merge_vpks reports every entry, evaluate_js is synchronous
+                percent = int(written * 100 / total) if total else 100
+                if percent == last_percent:
+                    return
+                last_percent = percent
+                webview.active_window().evaluate_js(
+                    f"window.__lsslauncher_on_mix_progress?.({percent})"
+                )
+
+            mix_name = get_uuid_file(f"mix:{mainId}:{subId}")
+            merged_path = APP_DATA_PATH / f"{mix_name}.merge"
+            try:
+                merge_vpks(main_path, sub_path, merged_path, on_progress)
+            except (OSError, VPKError) as e:
+                logger.warning(f"Local mix failed ({e}), using the server")
+                return False
+            get_pack_store().add(
+                mix_name,
+                merged_path,
+                kind="mix",
+                parents=[get_uuid_file(mainId), get_uuid_file(subId)],
+            )
+            webview.active_window().evaluate_js(
+                f'window.__lsslauncher_on_mix_ready?.("merge")'
+            )
+            return True
+
+        def worker():
+            # Both packs on disk: merge here instead of a server round trip
+            if merge_locally():
+                return
+
+            main_pack = self.catalog_cache.get_file(mainId) or {}
+            sub_pack = self.catalog_cache.get_file(subId) or {}
+            status, task_id = self.api.merge_pack(
+                main_pack.get("s3_key", ""), sub_pack.get("s3_key", "")
+            )
+            if status != 200 or not task_id:
+                logger.error(f"Failed to start mix: {status}")
+                webview.active_window().evaluate_js(
+                    "window.__lsslauncher_on_mix_error?.()"
+                )
+                return
+            self.task_watcher.watch(task_id, on_done)
+
         threading.Thread(target=worker, daemon=True).start()
 
     def dowload_mix(self):
@@ -173,19 +273,59 @@ class PyWebAPI:
     def uninstall_game(self):
         print("Uninstalling game")
 
-    def download_pack(self, id: str):
-        def worker():
-            for p in range(0, 101, 20):
-                time.sleep(0.2)
+    def download_pack(self, id: str, priority: int = 0):
+        def on_progress(job: DownloadJob):
+            percent = int(job.progress.percent)
+            webview.active_window().evaluate_js(
+                f"window.__lsslauncher_on_download_progress?.('{id}', {percent})"
+            )
+
+        def on_done(job: DownloadJob):
+            self.downloads.pop(id, None)
+            if job.state == JobState.DONE:
                 webview.active_window().evaluate_js(
-                    f"window.__lsslauncher_on_download_progress?.('{id}', {p})"
+                    f"window.__lsslauncher_on_download_done?.('{id}')"
+                )
+            elif job.state == JobState.FAILED:
+                webview.active_window().evaluate_js(
+                    f"window.__lsslauncher_on_download_error?.('{id}')"
                 )
 
+        file = self.catalog_cache.get_file(id)
+        if file is None:
+            logger.error(f"Pack '{id}' not found")
+            webview.active_window().evaluate_js(
+                f"window.__lsslauncher_on_download_error?.('{id}')"
+            )
+            return
+
+        job = self.api.submit_download(
+            file["url"],
+            get_uuid_file(id),
+            file.get("md5"),
+            priority=priority,
+            file_id=id,
+            on_progress=on_progress,
+            on_done=on_done,
+        )
+        if job is None:
             webview.active_window().evaluate_js(
                 f"window.__lsslauncher_on_download_done?.('{id}')"
             )
+            return
+        self.downloads[id] = job
 
-        threading.Thread(target=worker, daemon=True).start()
+    def pause_download(self, id: str):
+        if id in self.downloads:
+            self.downloads[id].pause()
+
+    def resume_download(self, id: str):
+        if id in self.downloads:
+            self.downloads[id].resume()
+
+    def cancel_download(self, id: str):
+        if id in self.downloads:
+            self.downloads.pop(id).cancel()
 
     def install_pack(self, id: str):
         self.installed_packs.add(id)
@@ -195,6 +335,7 @@ class PyWebAPI:
             self.favorites.add(id)
         else:
             self.favorites.discard(id)
+        self.catalog.set_favorite(id, isFavorite)
 
     def open_pack_screenshots(self, id: str):
         print(f"Open screenshots for {id}")
@@ -1,7 +1,7 @@
 from .api import API
+from .async_api import AsyncAPI
 from .auth import AuthUtil
 from .hwid import get_hwid
 from .install_pack import get_dota2_install_path
-from .screen_manager import ScreenManager
 
-__all__ = ["get_dota2_install_path", "ScreenManager", "API", "AuthUtil", "get_hwid"]
+__all__ = ["get_dota2_install_path", "API", "AsyncAPI", "AuthUtil", "get_hwid"]
@@ -1,22 +1,174 @@
-import gzip
-import hashlib
-import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterator, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import httpx
 from loguru import logger
-from utils.download import download
+from utils.delta import prepare_delta, verify_ranges
+from utils.download import DownloadProgress, GzipSink
+from utils.download_manager import DownloadJob, get_download_manager
+from utils.hash_cache import cached_hash_file
 from utils.helpers import get_folder
+from utils.pack_store import get_pack_store
 
 APP_DATA_PATH = Path(get_folder()) / "packs"
 BASE_URL = "https://lsslauncher.xyz"
 TIMEOUT = httpx.Timeout(10.0)
 
+FILES_PAGE_SIZE = 100
+FILES_MAX_PAGE_SIZE = 1000
+FILES_PREFETCH = 4
+
+
+class APIError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{message} (status {status})")
+        self.status = status
+
+
+class FilesPager:
+    """
+    Plans /files/ page requests for iter_files: pages are requested ahead
+    of consumption and grow while they come back full. A short page only
+    ends the listing if the server has already returned a page that size
+    in full (or `total` is reached); otherwise the server capped it, so
+    growth stops and the rest of that page is requested again.
+    """
+
+    def __init__(self, page_size: int, max_page_size: int):
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.next_skip = 0
+        self.total: Optional[int] = None
+        self.finished = False
+        # Largest page size the server has returned in full
+        self.honoured = 0
+        self.capped = False
+        self.received = 0
+
+    @property
+    def complete(self) -> bool:
+        """Whether every file was seen, not just a listing that stopped."""
+        if self.total is not None:
+            return self.received >= self.total
+        return self.finished
+
+    def next_page(self) -> Optional[Tuple[int, int]]:
+        if self.finished:
+            return None
+        if self.total is not None and self.next_skip >= self.total:
+            return None
+
+        page = (self.next_skip, self.page_size)
+        self.next_skip += self.page_size
+        return page
+
+    def feed(
+        self, skip: int, limit: int, payload
+    ) -> Tuple[List[dict], Optional[Tuple[int, int]]]:
+        """Items of a page, plus the page to request next if it came back capped."""
+        # The endpoint returns either a bare list or {"items": [...], "total": n}
+        if isinstance(payload, list):
+            items = payload
+        else:
+            items = payload.get("items", [])
+            if payload.get("total") is not None:
+                self.total = payload["total"]
+
+        count = len(items)
+        self.received += count
+        if count >= limit:
+            self.honoured = max(self.honoured, limit)
+            if self.total is None and not self.capped:
+                self.page_size = min(self.page_size * 2, self.max_page_size)
+            return items, None
+
+        if self._is_end(skip, count):
+            self.finished = True
+            return items, None
+
+        logger.info(f"Files page capped at {count} items (asked for {limit})")
+        self.capped = True
+        self.page_size = count
+        return items, (skip + count, limit - count)
+
+    def _is_end(self, skip: int, count: int) -> bool:
+        if count == 0:
+            return True
+        if self.total is not None:
+            return skip + count >= self.total
+        return count < self.honoured
+
+
+class BaseAPI:
+    """Request building and response handling shared by API and AsyncAPI."""
 
-class API:
     def __init__(self, token: Optional[str] = None):
         self.token = token
+
+    def _auth_headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        headers = {"accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = self.token
+        if extra:
+            headers.update(extra)
+        return headers
+
+    @staticmethod
+    def _token_request(login: str, password: str, hwid: str) -> Tuple[dict, dict]:
+        logger.info(f"Requesting token for user='{login}' hwid='{hwid}'")
+
+        headers = {
+            "accept": "application/json",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        data = {
+            "username": login,
+            "password": password,
+            "hwid": hwid,
+        }
+        return headers, data
+
+    def _token_result(self, status: int, payload: dict) -> int:
+        if status == 200:
+            self.token = (
+                f"{payload['token_type'].capitalize()} {payload['access_token']}"
+            )
+            logger.success("Token successfully obtained")
+            return 200
+
+        detail = payload.get("detail")
+        if detail == "Incorrect username or password":
+            return 401
+        if detail == "Invalid HWID":
+            return 409
+
+        return status
+
+    @staticmethod
+    def _parse_response(
+        method: str, endpoint: str, response: httpx.Response
+    ) -> Tuple[int, dict]:
+        logger.info(f"{method.upper()} {endpoint} -> {response.status_code}")
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            logger.error("Invalid JSON response")
+            return response.status_code, {}
+
+    @staticmethod
+    def _files_result(pager: FilesPager, files: List[dict]) -> Tuple[int, List[dict]]:
+        if not pager.complete:
+            logger.warning(f"Fetched {len(files)} of {pager.total} files, list may be partial")
+            return 206, files
+        logger.info(f"Fetched {len(files)} files")
+        return 200, files
+
+
+class API(BaseAPI):
+    def __init__(self, token: Optional[str] = None):
+        super().__init__(token)
         self.client = httpx.Client(
             base_url=BASE_URL,
             timeout=TIMEOUT,
@@ -28,77 +180,51 @@ class API:
     # Internal helpers
     # --------------------
 
-    def _auth_headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
-        headers = {"accept": "application/json"}
-        if self.token:
-            headers["Authorization"] = self.token
-        if extra:
-            headers.update(extra)
-        return headers
-
-    def _request(
+    def _send(
         self,
         method: str,
         endpoint: str,
         *,
         headers: Optional[Dict[str, str]] = None,
         **kwargs,
-    ) -> Tuple[int, dict]:
+    ) -> Optional[httpx.Response]:
         try:
-            response = self.client.request(
+            return self.client.request(
                 method,
                 endpoint,
                 headers=headers,
                 **kwargs,
             )
-            logger.info(f"{method.upper()} {endpoint} -> {response.status_code}")
-            try:
-                return response.status_code, response.json()
-            except ValueError:
-                logger.error("Invalid JSON response")
-                return response.status_code, {}
         except httpx.HTTPError as exc:
             logger.error(f"HTTP error: {exc}")
+            return None
+
+    def _request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> Tuple[int, dict]:
+        response = self._send(method, endpoint, headers=headers, **kwargs)
+        if response is None:
             return 0, {}
+        return self._parse_response(method, endpoint, response)
 
     # --------------------
     # Auth
     # --------------------
 
     def get_token(self, login: str, password: str, hwid: str) -> int:
-        logger.info(f"Requesting token for user='{login}' hwid='{hwid}'")
-
-        headers = {
-            "accept": "application/json",
-            "Content-Type": "application/x-www-form-urlencoded",
-        }
-        data = {
-            "username": login,
-            "password": password,
-            "hwid": hwid,
-        }
-
+        headers, data = self._token_request(login, password, hwid)
         status, payload = self._request(
             "POST",
             "/auth/token",
             headers=headers,
             data=data,
         )
-
-        if status == 200:
-            self.token = (
-                f"{payload['token_type'].capitalize()} {payload['access_token']}"
-            )
-            logger.success("Token successfully obtained")
-            return 200
-
-        detail = payload.get("detail")
-        if detail == "Incorrect username or password":
-            return 401
-        if detail == "Invalid HWID":
-            return 409
-
-        return status
+        return self._token_result(status, payload)
 
     def get_me(self, hwid: str) -> Tuple[int, dict]:
         headers = self._auth_headers({"x-hwid": hwid})
@@ -121,6 +247,107 @@ class API:
         headers = self._auth_headers()
         return self._request("GET", f"/files/{file_id}", headers=headers)
 
+    def get_file_blocks(self, file_id: int) -> Tuple[int, dict]:
+        """
+        Block manifest of the uncompressed pack for delta updates:
+        {"url", "size", "md5", "block_size", "blocks": [md5, ...]}.
+        """
+        headers = self._auth_headers()
+        return self._request("GET", f"/files/{file_id}/blocks", headers=headers)
+
+    def get_file_conditional(
+        self,
+        file_id: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Tuple[int, dict, Dict[str, str]]:
+        """
+        Revalidates cached file metadata. Returns 304 with an empty payload
+        when it hasn't changed, plus the ETag / Last-Modified validators.
+        """
+        extra = {}
+        if etag:
+            extra["If-None-Match"] = etag
+        if last_modified:
+            extra["If-Modified-Since"] = last_modified
+
+        endpoint = f"/files/{file_id}"
+        response = self._send("GET", endpoint, headers=self._auth_headers(extra))
+        if response is None:
+            return 0, {}, {}
+
+        validators = {
+            key: response.headers[key]
+            for key in ("ETag", "Last-Modified")
+            if key in response.headers
+        }
+        if response.status_code == 304:
+            logger.info(f"GET {endpoint} -> 304")
+            return 304, {}, validators
+
+        status, payload = self._parse_response("GET", endpoint, response)
+        return status, payload, validators
+
+    def iter_files(
+        self,
+        page_size: int = FILES_PAGE_SIZE,
+        max_page_size: int = FILES_MAX_PAGE_SIZE,
+        prefetch: int = FILES_PREFETCH,
+        pager: Optional[FilesPager] = None,
+    ) -> Iterator[dict]:
+        """
+        Yields every file of the catalog. Up to `prefetch` pages are in
+        flight while the current one is consumed. Raises APIError if a
+        page can't be fetched.
+        """
+        pager = pager or FilesPager(page_size, max_page_size)
+        pending: deque = deque()
+
+        with ThreadPoolExecutor(
+            max_workers=prefetch, thread_name_prefix="files-page"
+        ) as pool:
+            try:
+                while not pager.finished:
+                    while len(pending) < prefetch:
+                        page = pager.next_page()
+                        if page is None:
+                            break
+                        pending.append((page, pool.submit(self.get_files, *page)))
+                    if not pending:
+                        return
+
+                    page, future = pending.popleft()
+                    status, payload = future.result()
+                    if status != 200:
+                        raise APIError(status, "Failed to fetch files page")
+                    items, rest = pager.feed(*page, payload)
+                    if rest:
+                        # Ahead of the pages in flight, so items stay in order
+                        pending.appendleft((rest, pool.submit(self.get_files, *rest)))
+                    yield from items
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def get_all_files(
+        self,
+        page_size: int = FILES_PAGE_SIZE,
+        max_page_size: int = FILES_MAX_PAGE_SIZE,
+        **kwargs,
+    ) -> Tuple[int, List[dict]]:
+        """
+        Whole catalog. 200 only when it is known to be complete, 206 when
+        the listing ended without that confirmation.
+        """
+        pager = FilesPager(page_size, max_page_size)
+        files: List[dict] = []
+        try:
+            files.extend(self.iter_files(pager=pager, **kwargs))
+        except APIError as exc:
+            logger.error(f"Catalog sync stopped after {len(files)} files: {exc}")
+            return exc.status, files
+        return self._files_result(pager, files)
+
     # --------------------
     # Download
     # --------------------
@@ -130,36 +357,145 @@ class API:
         url: str,
         name: str,
         expected_md5: Optional[str],
-    ) -> Iterator[float]:
+        priority: int = 0,
+        file_id: Optional[int] = None,
+    ) -> Iterator[DownloadProgress]:
+        job = self.submit_download(
+            url, name, expected_md5, priority=priority, file_id=file_id
+        )
+        if job is None:
+            return
+
+        try:
+            yield from job
+        finally:
+            if not job.future.done():
+                job.cancel()
+
+    def submit_download(
+        self,
+        url: str,
+        name: str,
+        expected_md5: Optional[str],
+        *,
+        priority: int = 0,
+        parents: Iterable[str] = (),
+        file_id: Optional[int] = None,
+        on_progress: Optional[Callable[[DownloadJob], None]] = None,
+        on_done: Optional[Callable[[DownloadJob], None]] = None,
+    ) -> Optional[DownloadJob]:
+        """
+        Queues the pack on the shared DownloadManager and returns its job,
+        or None if the pack is already on disk. Mixes pass their source
+        packs as `parents`. With `file_id`, an outdated local copy is
+        patched with only the changed blocks when the server supports it.
+        """
+        kind = "mix" if parents else "pack"
         APP_DATA_PATH.mkdir(parents=True, exist_ok=True)
 
         local_path = APP_DATA_PATH / name
         gz_path = local_path.with_suffix(local_path.suffix + ".gz")
+        tmp_path = local_path.with_suffix(local_path.suffix + ".tmp")
 
         if local_path.exists():
-            if expected_md5 and self._check_md5(local_path, expected_md5):
-                logger.info("File already exists and hash matches")
-                return
-            elif not expected_md5:
+            if not expected_md5:
                 logger.info("File already exists")
-                return
+                get_pack_store().touch(name)
+                return None
+            digest = get_pack_store().digest(name)
+            if digest == expected_md5 or (
+                digest is None and self._check_md5(local_path, expected_md5)
+            ):
+                logger.info("File already exists and hash matches")
+                get_pack_store().touch(name)
+                return None
+            if file_id is not None:
+                job = self._submit_delta(
+                    file_id,
+                    name,
+                    expected_md5,
+                    kind,
+                    parents,
+                    priority=priority,
+                    on_progress=on_progress,
+                    on_done=on_done,
+                )
+                if job is not None:
+                    return job
+
+        # Same content under another name (e.g. a mix we already built)
+        if expected_md5 and get_pack_store().adopt(
+            name, expected_md5, kind, parents
+        ):
+            return None
+
+        # The .gz is decompressed and hashed as its contiguous prefix lands
+        # on disk; it is kept (with .meta) only until then, so an interrupted
+        # download resumes instead of restarting
+        sink = GzipSink(str(tmp_path))
+
+        def finalize():
+            if expected_md5 and sink.md5 != expected_md5:
+                tmp_path.unlink(missing_ok=True)
+                logger.error(f"MD5 mismatch for '{name}': {sink.md5} != {expected_md5}")
+                raise RuntimeError(f"Downloaded file '{name}' is corrupted")
+
+            store = get_pack_store()
+            store.add(name, tmp_path, sink.md5, kind, parents)
+            store.gc(keep=[name])
+            logger.success(f"Downloaded and extracted '{name}'")
 
-        for progress in download(url, str(gz_path)):
-            yield progress
+        return get_download_manager().submit(
+            url,
+            str(gz_path),
+            job_id=name,
+            sink=sink,
+            priority=priority,
+            finalize=finalize,
+            on_progress=on_progress,
+            on_done=on_done,
+        )
 
-        with gzip.open(gz_path, "rb") as src, open(local_path, "wb") as dst:
-            shutil.copyfileobj(src, dst)
+    def _submit_delta(
+        self,
+        file_id: int,
+        name: str,
+        expected_md5: str,
+        kind: str,
+        parents: Iterable[str],
+        **kwargs,
+    ) -> Optional[DownloadJob]:
+        status, manifest = self.get_file_blocks(file_id)
+        if status != 200 or manifest.get("md5") != expected_md5:
+            logger.info(f"No delta for '{name}' ({status}), full download")
+            return None
 
-        gz_path.unlink(missing_ok=True)
-        logger.success(f"Downloaded and extracted '{name}'")
+        local_path = APP_DATA_PATH / name
+        work_path = local_path.with_suffix(local_path.suffix + ".delta")
+        ranges = prepare_delta(local_path, work_path, manifest)
+
+        def finalize():
+            if not verify_ranges(work_path, manifest, ranges):
+                work_path.unlink(missing_ok=True)
+                raise RuntimeError(f"Delta update of '{name}' is corrupted")
+
+            store = get_pack_store()
+            store.add(name, work_path, expected_md5, kind, parents)
+            store.gc(keep=[name])
+            logger.success(f"Updated '{name}' in place")
+
+        return get_download_manager().submit(
+            manifest["url"],
+            str(work_path),
+            job_id=name,
+            ranges=ranges,
+            finalize=finalize,
+            **kwargs,
+        )
 
     @staticmethod
     def _check_md5(path: Path, expected: str) -> bool:
-        md5 = hashlib.md5()
-        with path.open("rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                md5.update(chunk)
-        return md5.hexdigest() == expected
+        return cached_hash_file(path)["md5"] == expected
 
     # --------------------
     # Tasks
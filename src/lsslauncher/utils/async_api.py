@@ -0,0 +1,200 @@
+import asyncio
+import importlib.util
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+from utils.api import (
+    BASE_URL,
+    FILES_MAX_PAGE_SIZE,
+    FILES_PAGE_SIZE,
+    FILES_PREFETCH,
+    TIMEOUT,
+    APIError,
+    BaseAPI,
+    FilesPager,
+)
+
+# One pool shared by every concurrent call from the webview backend
+LIMITS = httpx.Limits(
+    max_connections=20,
+    max_keepalive_connections=10,
+    keepalive_expiry=60.0,
+)
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class AsyncAPI(BaseAPI):
+    """
+    Async counterpart of API. Calls share one keep-alive connection pool
+    (multiplexed over HTTP/2 when available), so many requests can be in
+    flight at once without a thread each. Create and use it on a single
+    event loop, e.g. the shared background loop.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        super().__init__(token)
+        if client is None:
+            if not HTTP2_AVAILABLE:
+                logger.warning("h2 is not installed, AsyncAPI uses HTTP/1.1")
+            client = httpx.AsyncClient(
+                base_url=BASE_URL,
+                timeout=TIMEOUT,
+                limits=LIMITS,
+                http2=HTTP2_AVAILABLE,
+                verify=True,  # enforce HTTPS TLS verification
+            )
+        self.client = client
+        logger.info("AsyncAPI instance created")
+
+    # --------------------
+    # Internal helpers
+    # --------------------
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> Tuple[int, dict]:
+        try:
+            response = await self.client.request(
+                method,
+                endpoint,
+                headers=headers,
+                **kwargs,
+            )
+            return self._parse_response(method, endpoint, response)
+        except httpx.HTTPError as exc:
+            logger.error(f"HTTP error: {exc}")
+            return 0, {}
+
+    # --------------------
+    # Auth
+    # --------------------
+
+    async def get_token(self, login: str, password: str, hwid: str) -> int:
+        headers, data = self._token_request(login, password, hwid)
+        status, payload = await self._request(
+            "POST",
+            "/auth/token",
+            headers=headers,
+            data=data,
+        )
+        return self._token_result(status, payload)
+
+    async def get_me(self, hwid: str) -> Tuple[int, dict]:
+        headers = self._auth_headers({"x-hwid": hwid})
+        return await self._request("GET", "/users/me", headers=headers)
+
+    # --------------------
+    # Files
+    # --------------------
+
+    async def get_files(self, skip: int, limit: int) -> Tuple[int, dict]:
+        headers = self._auth_headers()
+        return await self._request(
+            "GET",
+            "/files/",
+            headers=headers,
+            params={"skip": skip, "limit": limit},
+        )
+
+    async def get_file(self, file_id: int) -> Tuple[int, dict]:
+        headers = self._auth_headers()
+        return await self._request("GET", f"/files/{file_id}", headers=headers)
+
+    async def iter_files(
+        self,
+        page_size: int = FILES_PAGE_SIZE,
+        max_page_size: int = FILES_MAX_PAGE_SIZE,
+        prefetch: int = FILES_PREFETCH,
+        pager: Optional[FilesPager] = None,
+    ) -> AsyncIterator[dict]:
+        """Async version of API.iter_files."""
+        pager = pager or FilesPager(page_size, max_page_size)
+        pending: deque = deque()
+
+        try:
+            while not pager.finished:
+                while len(pending) < prefetch:
+                    page = pager.next_page()
+                    if page is None:
+                        break
+                    task = asyncio.create_task(self.get_files(*page))
+                    pending.append((page, task))
+                if not pending:
+                    return
+
+                page, task = pending.popleft()
+                status, payload = await task
+                if status != 200:
+                    raise APIError(status, "Failed to fetch files page")
+                items, rest = pager.feed(*page, payload)
+                if rest:
+                    pending.appendleft((rest, asyncio.create_task(self.get_files(*rest))))
+                for item in items:
+                    yield item
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def get_all_files(
+        self,
+        page_size: int = FILES_PAGE_SIZE,
+        max_page_size: int = FILES_MAX_PAGE_SIZE,
+        **kwargs,
+    ) -> Tuple[int, List[dict]]:
+        pager = FilesPager(page_size, max_page_size)
+        files: List[dict] = []
+        try:
+            async for item in self.iter_files(pager=pager, **kwargs):
+                files.append(item)
+        except APIError as exc:
+            logger.error(f"Catalog sync stopped after {len(files)} files: {exc}")
+            return exc.status, files
+        return self._files_result(pager, files)
+
+    # --------------------
+    # Tasks
+    # --------------------
+
+    async def merge_pack(
+        self, s3_key_main: str, s3_key_second: str
+    ) -> Tuple[int, str]:
+        headers = self._auth_headers()
+        status, payload = await self._request(
+            "POST",
+            "/files/merge",
+            headers=headers,
+            json={
+                "first_key": s3_key_main,
+                "second_key": s3_key_second,
+            },
+        )
+        return status, payload.get("id", "")
+
+    async def get_task_status(self, task_id: str) -> Tuple[int, dict]:
+        headers = self._auth_headers()
+        return await self._request("GET", f"/task/{task_id}", headers=headers)
+
+    # --------------------
+    # Cleanup
+    # --------------------
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncAPI":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
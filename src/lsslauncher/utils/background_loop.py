@@ -0,0 +1,117 @@
+import asyncio
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """
+    One persistent asyncio loop on a daemon thread. Sync code hands it
+    coroutines and async generators instead of spinning up its own loop,
+    so sessions and connections opened on it live across calls.
+    """
+
+    def __init__(self, name: str = "lsslauncher-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name=name, daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Background loop '{name}' started")
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def run(self, coro: Coroutine[object, object, T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, func: Callable[..., object], *args) -> None:
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def on_shutdown(self, hook: Callable[[], Awaitable[None]]) -> None:
+        """Registers a coroutine function awaited on the loop before it stops."""
+        if hook not in self._shutdown_hooks:
+            self._shutdown_hooks.append(hook)
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Drives an async generator on the loop and hands its items to the
+        calling thread through a queue. Closing the returned iterator
+        cancels the generator.
+        """
+        items: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((True, item))
+            except Exception as exc:
+                items.put((False, exc))
+            else:
+                items.put((False, None))
+
+        future = self.run(pump())
+        try:
+            while True:
+                ok, value = items.get()
+                if ok:
+                    yield value
+                elif value is None:
+                    return
+                else:
+                    raise value
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def stop(self):
+        if not self.loop.is_running():
+            return
+
+        async def cancel_all():
+            tasks = [
+                t for t in asyncio.all_tasks() if t is not asyncio.current_task()
+            ]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for hook in self._shutdown_hooks:
+                try:
+                    await hook()
+                except Exception as exc:
+                    logger.error(f"Shutdown hook failed: {exc}")
+
+        if not self.in_loop_thread():
+            self.run(cancel_all()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        logger.info("Background loop stopped")
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+            atexit.register(_background_loop.stop)
+        return _background_loop
@@ -0,0 +1,254 @@
+import bisect
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from utils.helpers import human_readable_size, parse_readable_size
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SORT_KEYS = ("name", "size", "category")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class CatalogItem:
+    __slots__ = ("id", "name", "size", "category", "is_favorite")
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        size: int,
+        category: str,
+        is_favorite: bool = False,
+    ):
+        self.id = id
+        self.name = name
+        self.size = size
+        self.category = category
+        self.is_favorite = is_favorite
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CatalogItem":
+        size = data.get("size") or 0
+        if isinstance(size, str):
+            size = parse_readable_size(size)
+        return cls(
+            id=str(data["id"]),
+            # Present-but-null fields come through as None
+            name=str(data.get("name") or ""),
+            size=int(size),
+            category=str(data.get("category") or ""),
+            is_favorite=bool(data.get("isFavorite", False)),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "size": human_readable_size(self.size),
+            "category": self.category,
+            "isFavorite": self.is_favorite,
+        }
+
+
+class Catalog:
+    """
+    In-memory shop catalog with id, category and favorite indexes and a
+    token index over names for prefix search. Sorted orders are built
+    lazily and reused until the catalog changes.
+    """
+
+    def __init__(self, items: Iterable[dict] = ()):
+        self._lock = threading.RLock()
+        self._items: Dict[str, CatalogItem] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._favorites: Set[str] = set()
+        self._by_token: Dict[str, Set[str]] = {}
+        self._tokens: Optional[List[str]] = None
+        self._orders: Dict[str, List[str]] = {}
+        self.load(items)
+
+    # --------------------
+    # Mutations
+    # --------------------
+
+    def load(self, items: Iterable[dict], favorites: Iterable[str] = ()):
+        favorites = set(favorites)
+        with self._lock:
+            self._items.clear()
+            self._by_category.clear()
+            self._favorites.clear()
+            self._by_token.clear()
+            for data in items:
+                item = CatalogItem.from_dict(data)
+                item.is_favorite = item.is_favorite or item.id in favorites
+                self._index(item)
+            self._invalidate()
+        logger.info(f"Catalog loaded with {len(self._items)} items")
+
+    def upsert(self, data: dict):
+        item = CatalogItem.from_dict(data)
+        with self._lock:
+            old = self._items.get(item.id)
+            if old:
+                item.is_favorite = item.is_favorite or old.is_favorite
+                self._unindex(old)
+            self._index(item)
+            self._invalidate()
+
+    def remove(self, item_id: str):
+        with self._lock:
+            item = self._items.get(item_id)
+            if item:
+                self._unindex(item)
+                self._invalidate()
+
+    def set_favorite(self, item_id: str, is_favorite: bool):
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                return
+            item.is_favorite = is_favorite
+            if is_favorite:
+                self._favorites.add(item_id)
+            else:
+                self._favorites.discard(item_id)
+
+    # --------------------
+    # Queries
+    # --------------------
+
+    def get(self, item_id: str) -> Optional[CatalogItem]:
+        return self._items.get(item_id)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def search_ids(self, text: str) -> Set[str]:
+        """Ids whose name has, for every query token, a token starting with it."""
+        with self._lock:
+            result: Optional[Set[str]] = None
+            for prefix in tokenize(text):
+                matches = self._prefix_matches(prefix)
+                result = matches if result is None else result & matches
+                if not result:
+                    return set()
+            return result if result is not None else set(self._items)
+
+    def query(
+        self,
+        search: str = "",
+        category: Optional[str] = None,
+        favorites_only: bool = False,
+        sort: str = "name",
+        descending: bool = False,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> dict:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            if category is not None:
+                candidates = set(self._by_category.get(category, ()))
+            if favorites_only:
+                candidates = self._narrow(candidates, self._favorites)
+            if search.strip():
+                candidates = self._narrow(candidates, self.search_ids(search))
+
+            order = self._order(sort)
+            if descending:
+                order = order[::-1]
+
+            if candidates is None:
+                total = len(order)
+                ids = order[offset : offset + limit]
+            elif len(candidates) * 8 < len(order):
+                # Few matches: sorting them beats scanning the whole order
+                ids = sorted(
+                    candidates,
+                    key=lambda item_id: self._sort_key(self._items[item_id], sort),
+                    reverse=descending,
+                )
+                total = len(ids)
+                ids = ids[offset : offset + limit]
+            else:
+                matched = [item_id for item_id in order if item_id in candidates]
+                total = len(matched)
+                ids = matched[offset : offset + limit]
+
+            return {
+                "items": [self._items[item_id].to_dict() for item_id in ids],
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+            }
+
+    # --------------------
+    # Indexes
+    # --------------------
+
+    def _index(self, item: CatalogItem):
+        self._items[item.id] = item
+        self._by_category.setdefault(item.category, set()).add(item.id)
+        if item.is_favorite:
+            self._favorites.add(item.id)
+        for token in set(tokenize(item.name)):
+            self._by_token.setdefault(token, set()).add(item.id)
+
+    def _unindex(self, item: CatalogItem):
+        del self._items[item.id]
+        ids = self._by_category.get(item.category)
+        if ids is not None:
+            ids.discard(item.id)
+            if not ids:
+                del self._by_category[item.category]
+        self._favorites.discard(item.id)
+        for token in set(tokenize(item.name)):
+            ids = self._by_token.get(token)
+            if ids is not None:
+                ids.discard(item.id)
+                if not ids:
+                    del self._by_token[token]
+
+    def _invalidate(self):
+        self._tokens = None
+        self._orders.clear()
+
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        if self._tokens is None:
+            self._tokens = sorted(self._by_token)
+        result: Set[str] = set()
+        start = bisect.bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            result |= self._by_token[token]
+        return result
+
+    def _order(self, sort: str) -> List[str]:
+        order = self._orders.get(sort)
+        if order is None:
+            order = sorted(
+                self._items,
+                key=lambda item_id: self._sort_key(self._items[item_id], sort),
+            )
+            self._orders[sort] = order
+        return order
+
+    @staticmethod
+    def _sort_key(item: CatalogItem, sort: str):
+        if sort == "size":
+            return item.size, item.name.lower()
+        if sort == "category":
+            return item.category, item.name.lower()
+        return item.name.lower(), item.id
+
+    @staticmethod
+    def _narrow(candidates: Optional[Set[str]], ids: Set[str]) -> Set[str]:
+        return set(ids) if candidates is None else candidates & ids
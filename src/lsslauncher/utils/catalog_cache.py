@@ -0,0 +1,251 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+from utils.api import API
+from utils.helpers import get_folder
+
+CACHE_PATH = Path(get_folder()) / "cache" / "catalog.sqlite3"
+FILE_TTL = 60 * 60  # file metadata is fresh for an hour
+CATALOG_TTL = 10 * 60  # the full list is re-synced after ten minutes
+
+FileId = Union[int, str]
+
+
+class CatalogCache:
+    """
+    Persistent pack metadata keyed by file id. Reads are served from disk
+    straight away; stale entries are returned as-is and revalidated in the
+    background (stale-while-revalidate), using ETag / If-Modified-Since
+    when the server sends them.
+    """
+
+    def __init__(
+        self,
+        api: API,
+        path: Path = CACHE_PATH,
+        file_ttl: float = FILE_TTL,
+        catalog_ttl: float = CATALOG_TTL,
+    ):
+        self.api = api
+        self.file_ttl = file_ttl
+        self.catalog_ttl = catalog_ttl
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._init_schema()
+
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="catalog")
+        self._inflight: Dict[Tuple, Future] = {}
+        # Reentrant: a future that is already done runs its callback inline
+        self._inflight_lock = threading.RLock()
+        logger.info(f"Catalog cache opened at {path}")
+
+    # --------------------
+    # Reads
+    # --------------------
+
+    def get_file(self, file_id: FileId) -> Optional[dict]:
+        row = self._load(file_id)
+        if row is None:
+            return self.revalidate_file(file_id)
+
+        data, _, _, fetched_at = row
+        if time.time() - fetched_at > self.file_ttl:
+            self._in_background(("file", str(file_id)), self.revalidate_file, file_id)
+        return data
+
+    def get_files(self) -> List[dict]:
+        if self.catalog_age() > self.catalog_ttl:
+            self._in_background(("catalog",), self.sync_catalog)
+
+        with self._db_lock:
+            rows = self._db.execute("SELECT data FROM files ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def catalog_age(self) -> float:
+        synced_at = self._get_meta("catalog_synced_at")
+        if synced_at is None:
+            return float("inf")
+        return time.time() - float(synced_at)
+
+    # --------------------
+    # Network
+    # --------------------
+
+    def revalidate_file(self, file_id: FileId) -> Optional[dict]:
+        row = self._load(file_id)
+        data, etag, last_modified, _ = row or (None, None, None, 0.0)
+
+        status, payload, validators = self.api.get_file_conditional(
+            file_id, etag, last_modified
+        )
+        if status == 304 and row:
+            self._store(
+                file_id,
+                data,
+                validators.get("ETag", etag),
+                validators.get("Last-Modified", last_modified),
+            )
+            return data
+        if status == 200:
+            self._store(
+                file_id,
+                payload,
+                validators.get("ETag"),
+                validators.get("Last-Modified"),
+            )
+            return payload
+        if status == 404:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM files WHERE id = ?", (str(file_id),))
+            return None
+
+        # Offline or server error: keep serving what we have
+        logger.warning(f"Revalidation of file {file_id} failed ({status})")
+        return data
+
+    def sync_catalog(self) -> int:
+        """
+        Pulls the whole list and writes only the entries that changed.
+        Cached entries missing from the list are deleted only when the list
+        is known to be complete (200); after a partial one (206) they are
+        marked stale, so the next read revalidates them one by one.
+        """
+        status, files = self.api.get_all_files()
+        if status not in (200, 206):
+            logger.warning(f"Catalog sync failed ({status}), keeping cached data")
+            return status
+
+        now = time.time()
+        with self._db_lock:
+            cached = dict(self._db.execute("SELECT id, data FROM files"))
+
+        changed, unchanged, seen = [], [], set()
+        for file in files:
+            file_id = str(file["id"])
+            data = json.dumps(file, sort_keys=True)
+            seen.add(file_id)
+            if cached.get(file_id) == data:
+                unchanged.append((now, file_id))
+            else:
+                changed.append((file_id, data, now))
+        missing = [(file_id,) for file_id in cached.keys() - seen]
+
+        with self._db_lock, self._db:
+            # Changed entries drop their validators, they describe old data
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (id, data, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, NULL, NULL, ?)",
+                changed,
+            )
+            self._db.executemany(
+                "UPDATE files SET fetched_at = ? WHERE id = ?", unchanged
+            )
+            if status == 200:
+                self._db.executemany("DELETE FROM files WHERE id = ?", missing)
+            else:
+                self._db.executemany(
+                    "UPDATE files SET fetched_at = 0 WHERE id = ?", missing
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('catalog_synced_at', ?)",
+                (str(now),),
+            )
+
+        logger.info(
+            f"Catalog synced: {len(changed)} changed, {len(missing)} "
+            f"{'removed' if status == 200 else 'marked stale'}, "
+            f"{len(unchanged)} unchanged"
+        )
+        return status
+
+    def refresh_async(self) -> Future:
+        return self._in_background(("catalog",), self.sync_catalog)
+
+    # --------------------
+    # Storage
+    # --------------------
+
+    def _init_schema(self):
+        with self._db_lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _load(
+        self, file_id: FileId
+    ) -> Optional[Tuple[dict, Optional[str], Optional[str], float]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data, etag, last_modified, fetched_at FROM files WHERE id = ?",
+                (str(file_id),),
+            ).fetchone()
+        if row is None:
+            return None
+        data, etag, last_modified, fetched_at = row
+        return json.loads(data), etag, last_modified, fetched_at
+
+    def _store(
+        self,
+        file_id: FileId,
+        data: dict,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ):
+        with self._db_lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (id, data, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(file_id),
+                    json.dumps(data, sort_keys=True),
+                    etag,
+                    last_modified,
+                    time.time(),
+                ),
+            )
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _in_background(self, key: Tuple, func: Callable, *args) -> Future:
+        """Runs func once per key at a time; repeated requests share the future."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._pool.submit(func, *args)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            return future
+
+    def _forget(self, key: Tuple):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._db_lock:
+            self._db.close()
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import List, Tuple
+
+from loguru import logger
+from utils.helpers import human_readable_size
+
+Range = Tuple[int, int]
+
+
+def block_hashes(path: Path, block_size: int) -> List[str]:
+    """MD5 of every block_size slice of the file, the last one may be shorter."""
+    hashes = []
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            hashes.append(hashlib.md5(block).hexdigest())
+    return hashes
+
+
+def changed_ranges(path: Path, manifest: dict) -> List[Range]:
+    """
+    Inclusive byte ranges of `path` that differ from the server block
+    manifest ({"size", "block_size", "blocks": [md5, ...]}). Adjacent
+    blocks are merged so each range is a single request.
+    """
+    size = manifest["size"]
+    block_size = manifest["block_size"]
+    local = block_hashes(path, block_size)
+
+    ranges: List[Range] = []
+    for i, digest in enumerate(manifest["blocks"]):
+        if i < len(local) and local[i] == digest:
+            continue
+        start = i * block_size
+        end = min(start + block_size, size) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def prepare_delta(source: Path, work_path: Path, manifest: dict) -> List[Range]:
+    """
+    Readies `work_path` as a copy of `source` resized to the new version
+    and returns the ranges still to fetch. An interrupted patch (its
+    download .meta still exists) is picked up as is.
+    """
+    if not (work_path.exists() and os.path.exists(f"{work_path}.meta")):
+        # Never patch the source itself, it is shared with the pack store
+        shutil.copyfile(source, work_path)
+    with open(work_path, "r+b") as f:
+        f.truncate(manifest["size"])
+
+    ranges = changed_ranges(work_path, manifest)
+    changed = sum(end - start + 1 for start, end in ranges)
+    logger.info(
+        f"Delta for {source.name}: {len(ranges)} ranges, "
+        f"{human_readable_size(changed)} of {human_readable_size(manifest['size'])}"
+    )
+    return ranges
+
+
+def verify_ranges(path: Path, manifest: dict, ranges: List[Range]) -> bool:
+    """Re-hashes only the blocks a delta touched; the rest already matched."""
+    block_size = manifest["block_size"]
+    blocks = manifest["blocks"]
+    if os.path.getsize(path) != manifest["size"]:
+        return False
+
+    with open(path, "rb") as f:
+        for start, end in ranges:
+            for i in range(start // block_size, end // block_size + 1):
+                f.seek(i * block_size)
+                if hashlib.md5(f.read(block_size)).hexdigest() != blocks[i]:
+                    logger.error(f"Block {i} of {path.name} does not match after patch")
+                    return False
+    return True
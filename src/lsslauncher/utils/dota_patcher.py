@@ -1,83 +1,30 @@
-import shutil
 import hashlib
+import json
+import os
+import shutil
 import zlib
 from pathlib import Path
-import psutil
 from loguru import logger
-import requests
+from utils.gameinfo_cache import get_default_gameinfo
+from utils.helpers import stat_record
+from utils.process_watcher import get_process_watcher
 
 DOTA_MOD_FOLDER = "DotaLSS"
+PATCH_STATE_FILE = "lss_patch.json"
+INSTALL_MANIFEST = "lss_install.json"
+PATCH_MARKER = "// Patched by LSSLauncher"
+SIGNATURE_ENTRY_PREFIX = "...\\..\\..\\dota\\gameinfo_branchspecific.gi~"
 
 def is_dota2_running():
     logger.info("Checking if Dota 2 is currently running...")
-    for proc in psutil.process_iter(['name']):
-        if proc.info['name'] and proc.info['name'].lower().startswith("dota2"):
-            logger.warning("Dota 2 is currently running!")
-            return True
+    if get_process_watcher().is_running():
+        logger.warning("Dota 2 is currently running!")
+        return True
     logger.info("Dota 2 is not running")
     return False
 
 
-def calculate_hashes(file_path: Path):
-    logger.info(f"Calculating SHA1 and CRC32 for {file_path}")
-    sha1 = hashlib.sha1()
-    crc32 = 0
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(4096):
-            sha1.update(chunk)
-            crc32 = zlib.crc32(chunk, crc32)
-    sha1_hex = sha1.hexdigest().upper()
-    crc32 &= 0xFFFFFFFF
-    little_endian_bytes = crc32.to_bytes(4, byteorder='little').hex().upper()
-    logger.info(f"Calculated hashes - SHA1: {sha1_hex}, CRC32:{little_endian_bytes}")
-    return sha1_hex, little_endian_bytes
-
-
-def validate_patch_state(gameinfo_path: Path, dota_signatures_path: Path):
-    logger.info("Validating patch state...")
-    gameinfo_patched = False
-    dota_signatures_patched = False
-
-    with open(gameinfo_path, 'r', encoding='utf-8', errors='ignore') as f:
-        contents = f.read()
-        if "// Patched by LSSLauncher" in contents:
-            gameinfo_patched = True
-            logger.info("gameinfo is already patched")
-
-    with open(dota_signatures_path, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.read().splitlines()
-        if lines:
-            last_line = lines[-1]
-            if last_line.startswith("..."):
-                actual_sha1, actual_crc32 = calculate_hashes(gameinfo_path)
-                try:
-                    _, info = last_line.split("~", 1)
-                    sha1_part, crc_part = info.split(";")
-                    sha1 = sha1_part.split(":")[1].strip()
-                    crc32 = crc_part.split(":")[1].strip()
-                    if actual_sha1 == sha1 and actual_crc32 == crc32:
-                        dota_signatures_patched = True
-                        logger.info("dota.signatures is already patched")
-                except Exception:
-                    logger.error("Failed to validate dota.signatures entry")
-
-    return gameinfo_patched, dota_signatures_patched
-
-
-def backup_file(path: Path, new_ext: str):
-    backup = path.with_suffix(new_ext)
-    if not backup.exists():
-        shutil.copy(path, backup)
-        logger.info(f"Backup created: {path} -> {backup}")
-    else:
-        logger.info(f"Backup already exists: {backup}")
-
-
-def modify_gameinfo(gameinfo_path: Path):
-    logger.info(f"Modifying gameinfo file: {gameinfo_path}")
-    with open(gameinfo_path, 'r', encoding='utf-8', errors='ignore') as f:
-        contents = f.read()
-
+def patched_gameinfo(contents: str) -> str:
     insert = '''
         SearchPaths // Patched by LSSLauncher
         {
@@ -111,88 +58,96 @@ def modify_gameinfo(gameinfo_path: Path):
         logger.error("Closing bracket for FileSystem not found")
         raise RuntimeError("Unable to find closing bracket for FileSystem")
 
-    new_content = contents[:br_idx] + insert + contents[br_idx:]
-    with open(gameinfo_path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    logger.info("gameinfo file successfully modified")
+    return contents[:br_idx] + insert + contents[br_idx:]
 
 
-def modify_dota_signatures(dota_signatures_path: Path, sha1: str, crc32: str):
-    logger.info(f"Appending new patch entry to {dota_signatures_path}")
-    with open(dota_signatures_path, 'a', encoding='utf-8') as f:
-        patch = f"...\\..\\..\\dota\\gameinfo_branchspecific.gi~SHA1:{sha1};CRC:{crc32}"
-        f.write("\n" + patch)
-    logger.info("dota.signatures updated successfully")
+def signature_entry(sha1: str, crc32: str) -> str:
+    return f"{SIGNATURE_ENTRY_PREFIX}SHA1:{sha1};CRC:{crc32}"
 
-def get_default_gi(output_file):
-    logger.info("Get default gi file")
-    try:
-        response = requests.get("https://raw.githubusercontent.com/SteamDatabase/GameTracking-Dota2/refs/heads/master/game/dota/gameinfo_branchspecific.gi")
-        response.raise_for_status()  # проверка на ошибки HTTP
-
-        with open(output_file, "wb") as f:
-            f.write(response.content)
-
-        logger.success("Gi file is default")
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"While dowload gi file exception {e}")
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
 
-def reset_sign(file_path):
-    """
-    Открывает файл и удаляет все строки начиная с той, где первые символы 'DIGEST'.
-    Изменяет файл на месте.
-    
-    :param file_path: путь к редактируемому файлу
-    """
-    logger.info("Reseting signature file")
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
 
-        # Находим индекс строки, которая начинается с "DIGEST"
-        digest_index = None
-        for i, line in enumerate(lines):
-            if line.startswith("DIGEST"):
-                digest_index = i
-                break
+def _patched_signatures(contents: bytes, entry: str) -> bytes:
+    """Signatures cut after the DIGEST line, with our gameinfo entry appended."""
+    lines = contents.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if line.startswith(b"DIGEST"):
+            lines = lines[:i + 1]
+            break
+    # Without a DIGEST line older entries would pile up on every patch
+    prefix = SIGNATURE_ENTRY_PREFIX.encode()
+    lines = [line for line in lines if not line.startswith(prefix)]
+    newline = b"\r\n" if b"\r\n" in contents else b"\n"
+    return b"".join(lines) + newline + entry.encode("utf-8")
 
-        if digest_index is not None:
-            # Оставляем только строки до этой строки
-            lines = lines[:digest_index + 1]
 
-        # Перезаписываем файл
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
-        logger.success("Signatures file reset")
-
-    except Exception as e:
-        logger.error(f"While reseting signatures file except {e}")
+def _patch_state(gameinfo_path: Path, dota_signatures_path: Path) -> dict:
+    return {
+        "gameinfo": stat_record(gameinfo_path),
+        "signatures": stat_record(dota_signatures_path),
+    }
 
 
 def patch_dota(dota_path: str):
-    if is_dota2_running():
-        return 1
-
+    """
+    Reads gameinfo and dota.signatures once, works out what has to change
+    and rewrites (atomically) only the files that differ. The resulting
+    file stats are recorded, so an already patched game costs two stats.
+    """
     game_path = Path(dota_path)
     gameinfo_path = game_path / "game/dota/gameinfo_branchspecific.gi"
     dota_signatures_path = game_path / "game/bin/win64/dota.signatures"
     mod_dir_path = game_path / f"game/{DOTA_MOD_FOLDER}"
-    
-    reset_sign(dota_signatures_path)
-    gameinfo_patched, dota_signatures_patched = validate_patch_state(gameinfo_path, dota_signatures_path)
+    state_path = mod_dir_path / PATCH_STATE_FILE
+
+    try:
+        saved_state = json.loads(state_path.read_text())
+    except (OSError, ValueError):
+        saved_state = None
+    if saved_state == _patch_state(gameinfo_path, dota_signatures_path):
+        logger.info("Dota 2 is already patched, nothing changed")
+        return
+
+    if is_dota2_running():
+        return 1
 
-    if not gameinfo_patched:
-        get_default_gi(gameinfo_path)
-        backup_file(gameinfo_path, ".gi_backup")
-        modify_gameinfo(gameinfo_path)
-    sha1, crc32 = calculate_hashes(gameinfo_path)
-    modify_dota_signatures(dota_signatures_path, sha1, crc32)
+    gameinfo = gameinfo_path.read_bytes()
+    signatures = dota_signatures_path.read_bytes()
+
+    if PATCH_MARKER.encode() not in gameinfo:
+        # The game's file is unpatched here, a better fallback than an
+        # old .gi_backup that may predate a game update
+        gameinfo = get_default_gameinfo().get(fallback=gameinfo)
+        backup = gameinfo_path.with_suffix(".gi_backup")
+        if not backup.exists():
+            _write_atomic(backup, gameinfo)
+            logger.info(f"Backup created: {gameinfo_path} -> {backup}")
+        gameinfo = patched_gameinfo(
+            gameinfo.decode("utf-8", errors="ignore")
+        ).encode("utf-8")
+        _write_atomic(gameinfo_path, gameinfo)
+        logger.info("gameinfo file successfully modified")
+
+    sha1 = hashlib.sha1(gameinfo).hexdigest().upper()
+    crc32 = (zlib.crc32(gameinfo) & 0xFFFFFFFF).to_bytes(4, byteorder='little').hex().upper()
+    new_signatures = _patched_signatures(signatures, signature_entry(sha1, crc32))
+    if new_signatures != signatures:
+        _write_atomic(dota_signatures_path, new_signatures)
+        logger.info("dota.signatures updated successfully")
 
     if not mod_dir_path.exists():
         mod_dir_path.mkdir(parents=True, exist_ok=True)
         logger.info(f"Mod directory created: {mod_dir_path}")
 
+    _write_atomic(
+        state_path,
+        json.dumps(_patch_state(gameinfo_path, dota_signatures_path)).encode(),
+    )
     logger.success("Patch applied successfully!")
 
 
@@ -1,14 +1,237 @@
 import asyncio
+import bisect
+import contextlib
+import hashlib
 import json
+import math
 import os
 import shutil
+import time
+import zlib
+from dataclasses import dataclass, replace
 from tempfile import mkdtemp
-from typing import AsyncGenerator, Iterator
+from typing import AsyncGenerator, Iterator, Optional, Protocol
 
 import aiohttp
 from loguru import logger
+from utils.background_loop import get_background_loop
 
 CHUNK_SIZE = 256 * 1024  # 256 KB
+SINK_FEED_SIZE = 1024 * 1024  # bytes handed to a sink per loop iteration
+STATE_FLUSH_INTERVAL = 1.0  # seconds between .meta flushes while downloading
+RANGE_RETRIES = 5  # attempts per range after the first one
+RETRY_BACKOFF = 0.5  # seconds before the first retry, doubled on each attempt
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass(frozen=True)
+class DownloadConfig:
+    """Limits for the adaptive multipart scheduler."""
+
+    min_connections: int = 1
+    max_connections: int = 8
+    initial_connections: int = 4
+    min_part_size: int = 1 * 1024 * 1024
+    max_part_size: int = 32 * 1024 * 1024
+    parts_per_connection: int = 4
+    # A running range is only split if both halves get at least this much
+    min_split_size: int = 2 * 1024 * 1024
+    # How often throughput is sampled to grow or shrink concurrency
+    adapt_interval: float = 2.0
+    # Relative throughput change that counts as a real gain or loss
+    adapt_threshold: float = 0.1
+    # Minimum seconds between two progress events
+    progress_interval: float = 0.1
+    # Time constant of the smoothed speed used for the ETA
+    speed_smoothing: float = 3.0
+
+
+@dataclass(frozen=True)
+class DownloadProgress:
+    downloaded: int
+    total: int
+    speed: float  # bytes/s since the previous event
+    avg_speed: float  # exponentially smoothed bytes/s
+    eta: Optional[float]  # seconds, None while unknown
+    connections: int
+
+    @property
+    def percent(self) -> float:
+        if not self.total:
+            return 0.0
+        return self.downloaded / self.total * 100
+
+
+class RangeNotSupportedError(RuntimeError):
+    """The server answered a ranged request with the whole file."""
+
+
+class _TransientError(RuntimeError):
+    pass
+
+
+def _check_range_status(resp: aiohttp.ClientResponse):
+    if resp.status == 206:
+        return
+    if resp.status == 200:
+        raise RangeNotSupportedError("Range lost")
+    if resp.status in RETRY_STATUSES:
+        raise _TransientError(f"HTTP {resp.status}")
+    raise RuntimeError(f"Range request failed with HTTP {resp.status}")
+
+
+async def _retry(action, what: str):
+    """
+    Runs `action` again with exponential backoff while it fails with a
+    network error or a retryable status; anything else propagates at once.
+    """
+    for attempt in range(RANGE_RETRIES + 1):
+        try:
+            return await action()
+        except (aiohttp.ClientError, asyncio.TimeoutError, _TransientError) as e:
+            if attempt == RANGE_RETRIES:
+                raise
+            delay = RETRY_BACKOFF * 2**attempt
+            logger.warning(f"{what} failed ({e!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+class TokenBucket:
+    """
+    Shared bandwidth limit in bytes/s. Consumers may overdraw the bucket
+    and then sleep off the debt, so chunks larger than the burst still pass.
+    """
+
+    def __init__(self, rate: Optional[float] = None):
+        self.rate = rate
+        self._tokens = rate or 0.0
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate: Optional[float]):
+        self.rate = rate
+        self._tokens = min(self._tokens, rate or 0.0)
+
+    async def consume(self, amount: int):
+        if not self.rate:
+            return
+
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class _ProgressMeter:
+    """Turns a running byte counter into rate-limited progress events."""
+
+    def __init__(self, total: int, downloaded: int, config: DownloadConfig):
+        self.total = total
+        self.config = config
+        self._last_bytes = downloaded
+        self._last_time = time.monotonic()
+        self._avg_speed = 0.0
+
+    def update(
+        self, downloaded: int, connections: int, force: bool = False
+    ) -> Optional[DownloadProgress]:
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if not force and elapsed < self.config.progress_interval:
+            return None
+
+        speed = (downloaded - self._last_bytes) / elapsed if elapsed > 0 else 0.0
+        if self._avg_speed:
+            # Time-aware EWMA, so irregular event spacing doesn't skew it
+            alpha = 1 - math.exp(-elapsed / self.config.speed_smoothing)
+            self._avg_speed += alpha * (speed - self._avg_speed)
+        else:
+            self._avg_speed = speed
+        self._last_bytes = downloaded
+        self._last_time = now
+
+        eta = None
+        if self.total and self._avg_speed > 0:
+            eta = max(self.total - downloaded, 0) / self._avg_speed
+
+        return DownloadProgress(
+            downloaded=downloaded,
+            total=self.total,
+            speed=speed,
+            avg_speed=self._avg_speed,
+            eta=eta,
+            connections=connections,
+        )
+
+
+class StreamSink(Protocol):
+    def write(self, data: bytes) -> None: ...
+
+    def reset(self) -> None: ...
+
+    def close(self) -> None: ...
+
+    def discard(self) -> None: ...
+
+
+# -------------------------
+# Gzip sink
+# -------------------------
+class GzipSink:
+    """
+    Decompresses a gzip stream on the fly, hashes the decompressed bytes
+    and writes them to `path`, so the pack is never read back to be
+    extracted or verified.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._md5 = hashlib.md5()
+
+    @property
+    def md5(self) -> str:
+        return self._md5.hexdigest()
+
+    def write(self, data: bytes) -> None:
+        if self._file is None:
+            # Opened lazily so queued downloads don't hold file handles
+            self._file = open(self.path, "wb")
+        while data:
+            out = self._decompressor.decompress(data)
+            if out:
+                self._md5.update(out)
+                self._file.write(out)
+            if not self._decompressor.eof:
+                return
+            # Concatenated gzip members: keep going with a fresh decompressor
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def reset(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._md5 = hashlib.md5()
+
+    def close(self) -> None:
+        if self._file:
+            out = self._decompressor.flush()
+            if out:
+                self._md5.update(out)
+                self._file.write(out)
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
 
 
 class Downloader:
@@ -16,61 +239,145 @@ class Downloader:
         self,
         url: str,
         filename: str,
-        part_size: int = 10 * 1024 * 1024,
-        max_connections: int = 5,
+        part_size: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        sink: Optional[StreamSink] = None,
+        preallocate: bool = True,
+        config: Optional[DownloadConfig] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        connection_limit: Optional[asyncio.Semaphore] = None,
+        bandwidth: Optional[TokenBucket] = None,
+        ranges: Optional[list[tuple[int, int]]] = None,
     ):
+        if ranges is not None and (sink or not preallocate):
+            raise ValueError("Ranges are patched in place, a preallocated file is required")
+        if sink and not preallocate:
+            raise ValueError("A sink is fed from the preallocated target")
         self.url = url
+        # With a sink this holds the raw (compressed) bytes: it backs resume
+        # and is removed once the sink has consumed all of it
         self.filename = filename
+        self.config = config or DownloadConfig()
+        if max_connections is not None:
+            self.config = replace(self.config, max_connections=max_connections)
+        # None means "derive from file_size once it is known"
         self.part_size = part_size
-        self.max_connections = max_connections
+        self.sink = sink
+        # Write every range straight into a pre-sized target file instead
+        # of part files that have to be joined afterwards
+        self.preallocate = preallocate
+        # Shared with other downloads when driven by a DownloadManager
+        self.session = session
+        self.connection_limit = connection_limit
+        self.bandwidth = bandwidth
+        # Inclusive byte ranges to (re)fetch into an existing file; the
+        # rest of the file is left as is (delta updates)
+        self.ranges = ranges
 
         self.temp_dir = f"{filename}.parts"
         self.meta_file = f"{filename}.meta"
 
+        self._state_saved_at = 0.0
+        # Bytes of the target already handed to the sink, in file order
+        self._fed = 0
+        self._feed_wakeup = asyncio.Event()
+
+        # Scheduler state, only meaningful while a multipart download runs
+        self._pending: list[dict] = []
+        self._active: dict[int, dict] = {}
+        self._workers: set[asyncio.Task] = set()
+        self._target_connections = 0
+        self._downloaded = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._meter: Optional[_ProgressMeter] = None
+
         self.file_size: int | None = None
         self.parts: list[dict] = []
 
     # -------------------------
     # Public API
     # -------------------------
-    async def download(self) -> AsyncGenerator[float, None]:
-        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60)
+    async def download(self) -> AsyncGenerator[DownloadProgress, None]:
+        if self.session:
+            async for p in self._download(self.session):
+                yield p
+            return
 
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            if not await self._check_range_support(session):
-                logger.warning("Range not supported → single download")
-                async for p in self._download_single(session):
-                    yield p
-                return
+            async for p in self._download(session):
+                yield p
+
+    async def _download(self, session) -> AsyncGenerator[DownloadProgress, None]:
+        if not await self._check_range_support(session):
+            logger.warning("Range not supported → single download")
+            async for p in self._download_single(session):
+                yield p
+            return
 
-            self._prepare_parts()
+        self._prepare_parts()
 
-            try:
-                async for p in self._download_multipart(session):
-                    yield p
-            except Exception as e:
-                logger.error(f"Multipart failed: {e}")
-                logger.warning("Fallback to single download")
-                async for p in self._download_single(session):
-                    yield p
+        try:
+            async for p in self._download_multipart(session):
+                yield p
+        except RangeNotSupportedError:
+            # Saved ranges can't be completed from this server any more.
+            # Any other error propagates with the state intact, so the next
+            # attempt resumes instead of starting over
+            logger.warning("Server stopped honouring ranges → single download")
+            self.cleanup()
+            if self.sink and os.path.exists(self.filename):
+                os.remove(self.filename)
+            async for p in self._download_single(session):
+                yield p
 
     # -------------------------
     # Range check + size
     # -------------------------
     async def _check_range_support(self, session) -> bool:
-        try:
-            async with session.get(self.url, headers={"Range": "bytes=0-0"}) as resp:
-                if resp.status != 206:
-                    return False
-                self.file_size = int(resp.headers["Content-Range"].split("/")[-1])
-                return True
-        except Exception:
-            return False
+        async def probe() -> bool:
+            async with self._connection_slot():
+                async with session.get(
+                    self.url, headers={"Range": "bytes=0-0"}
+                ) as resp:
+                    # 200, 416 for an empty file, 403/405 from servers that
+                    # refuse ranges: a plain GET may still work
+                    if resp.status != 206 and resp.status not in RETRY_STATUSES:
+                        return False
+                    _check_range_status(resp)
+                    self.file_size = int(
+                        resp.headers["Content-Range"].split("/")[-1]
+                    )
+                    return True
+
+        return await _retry(probe, "Range check")
+
+    def _connection_slot(self):
+        if self.connection_limit:
+            return self.connection_limit
+        return contextlib.nullcontext()
 
     # -------------------------
     # Resume state
     # -------------------------
     def _prepare_parts(self):
+        if self.sink:
+            # Decompressor state can't be persisted: the sink restarts and
+            # is fed the already downloaded prefix again from disk
+            self.sink.reset()
+            self._fed = 0
+
+        if self.preallocate:
+            if os.path.exists(self.meta_file) and self._target_matches():
+                self._load_state()
+                logger.info("Resume detected")
+                return
+
+            self._allocate_target()
+            self.parts = self._split_parts()
+            self._save_state()
+            return
+
         os.makedirs(self.temp_dir, exist_ok=True)
 
         if os.path.exists(self.meta_file):
@@ -78,25 +385,60 @@ class Downloader:
             logger.info("Resume detected")
             return
 
-        parts = (self.file_size // self.part_size) + 1
-        self.parts = []
+        self.parts = self._split_parts()
+        self._save_state()
 
-        for i in range(parts):
-            start = i * self.part_size
-            end = min(start + self.part_size - 1, self.file_size - 1)
-            self.parts.append(
-                {
-                    "id": i,
-                    "start": start,
-                    "end": end,
-                    "done": False,
-                }
-            )
+    def _target_matches(self) -> bool:
+        return (
+            os.path.exists(self.filename)
+            and os.path.getsize(self.filename) == self.file_size
+        )
 
-        self._save_state()
+    def _allocate_target(self):
+        keep = self.ranges is not None and os.path.exists(self.filename)
+        with open(self.filename, "r+b" if keep else "wb") as f:
+            f.truncate(self.file_size)
+        logger.info(f"Preallocated {self.file_size} bytes for {self.filename}")
+
+    def _choose_part_size(self) -> int:
+        if self.part_size:
+            return self.part_size
+
+        cfg = self.config
+        size = self._total_bytes() // (cfg.max_connections * cfg.parts_per_connection)
+        return min(max(size, cfg.min_part_size), cfg.max_part_size)
+
+    def _split_parts(self) -> list[dict]:
+        part_size = self._choose_part_size()
+        ranges = self.ranges
+        if ranges is None:
+            ranges = [(0, self.file_size - 1)]
+        result = []
+
+        for first, last in ranges:
+            for start in range(first, last + 1, part_size):
+                result.append(
+                    {
+                        "id": len(result),
+                        "start": start,
+                        "end": min(start + part_size - 1, last),
+                        "written": 0,
+                        "done": False,
+                    }
+                )
+
+        return result
+
+    def _total_bytes(self) -> int:
+        if self.parts:
+            return sum(self._part_length(p) for p in self.parts)
+        if self.ranges is not None:
+            return sum(last - first + 1 for first, last in self.ranges)
+        return self.file_size
 
     def _save_state(self):
-        with open(self.meta_file, "w") as f:
+        tmp_file = f"{self.meta_file}.tmp"
+        with open(tmp_file, "w") as f:
             json.dump(
                 {
                     "file_size": self.file_size,
@@ -104,6 +446,12 @@ class Downloader:
                 },
                 f,
             )
+        os.replace(tmp_file, self.meta_file)
+        self._state_saved_at = time.monotonic()
+
+    def _maybe_save_state(self):
+        if time.monotonic() - self._state_saved_at >= STATE_FLUSH_INTERVAL:
+            self._save_state()
 
     def _load_state(self):
         with open(self.meta_file) as f:
@@ -112,72 +460,339 @@ class Downloader:
         self.parts = data["parts"]
 
         for part in self.parts:
-            part_file = self._part_path(part["id"])
-            if os.path.exists(part_file):
-                part["done"] = True
+            length = self._part_length(part)
+            if self.preallocate:
+                # Part handles are unbuffered, so everything recorded in the
+                # state is already on disk
+                written = part.get("written", length if part["done"] else 0)
+            else:
+                part_file = self._part_path(part["id"])
+                written = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+
+            part["written"] = min(written, length)
+            part["done"] = part["written"] == length
 
     # -------------------------
     # Multipart download
     # -------------------------
-    async def _download_multipart(self, session) -> AsyncGenerator[float, None]:
-        semaphore = asyncio.Semaphore(self.max_connections)
-
-        total_downloaded = sum(
-            os.path.getsize(self._part_path(p["id"])) for p in self.parts if p["done"]
+    async def _download_multipart(self, session) -> AsyncGenerator[DownloadProgress, None]:
+        self._pending = [p for p in self.parts if not p["done"]]
+        self._active = {}
+        self._workers = set()
+        self._downloaded = sum(p["written"] for p in self.parts)
+        self._events = asyncio.Queue()
+        self._meter = _ProgressMeter(self._total_bytes(), self._downloaded, self.config)
+        self._target_connections = max(
+            self.config.min_connections,
+            min(self.config.initial_connections, self.config.max_connections),
         )
 
-        async def runner(part):
-            async with semaphore:
-                if part["done"]:
-                    return 0
-                return await self._fetch_part(session, part)
+        controller = asyncio.create_task(self._adapt_connections(session))
+        feeder = None
+        if self.sink:
+            feeder = asyncio.create_task(self._feed_sink())
+            feeder.add_done_callback(self._on_feeder_done)
+        self._spawn_workers(session)
+        if not self._workers:
+            self._events.put_nowait(None)
 
-        tasks = [runner(p) for p in self.parts]
+        try:
+            while True:
+                event = await self._events.get()
+                if event is None:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+            if feeder and all(p["done"] for p in self.parts):
+                # Inflate whatever the workers left behind
+                self._feed_wakeup.set()
+                await feeder
+        finally:
+            controller.cancel()
+            for worker in list(self._workers):
+                worker.cancel()
+            if feeder and not feeder.done():
+                feeder.cancel()
+            await asyncio.gather(
+                controller, *self._workers, *filter(None, [feeder]), return_exceptions=True
+            )
+            # Keep every byte fetched so far when paused or cancelled
+            self._save_state()
+
+        if not all(p["done"] for p in self.parts):
+            raise RuntimeError("Multipart download finished with missing parts")
+
+        if self.sink:
+            self.sink.close()
+            self.cleanup()
+            os.remove(self.filename)
+        else:
+            if not self.preallocate:
+                self._join_parts()
+            self.cleanup()
+        yield self._meter.update(self._total_bytes(), 0, force=True)
 
-        for coro in asyncio.as_completed(tasks):
-            downloaded = await coro
-            total_downloaded += downloaded
-            yield total_downloaded / self.file_size * 100
+    # -------------------------
+    # Sink feeding
+    # -------------------------
+    def _written_prefix(self) -> int:
+        """End of the contiguous run of downloaded bytes from offset 0."""
+        for part in self.parts:
+            if not part["done"]:
+                return part["start"] + part["written"]
+        return self.file_size
+
+    async def _feed_sink(self):
+        """
+        Hands the target to the sink strictly in file order, reading back
+        what the workers wrote (usually still in the page cache). Returns
+        once the whole file has been fed; on resume it first re-inflates
+        the prefix that is already on disk.
+        """
+        # Unbuffered: a buffered reader would read ahead past the prefix and
+        # keep returning the preallocated zeros the workers overwrite later
+        with open(self.filename, "rb", buffering=0) as f:
+            f.seek(self._fed)
+            while self._fed < self.file_size:
+                prefix = self._written_prefix()
+                if prefix <= self._fed:
+                    await self._feed_wakeup.wait()
+                    self._feed_wakeup.clear()
+                    continue
+
+                data = f.read(min(prefix - self._fed, SINK_FEED_SIZE))
+                if not data:
+                    raise RuntimeError("Target is shorter than its download state")
+                self.sink.write(data)
+                self._fed += len(data)
+                # Let the workers run between blocks
+                await asyncio.sleep(0)
+
+    def _spawn_workers(self, session):
+        while len(self._workers) < self._target_connections and (
+            self._pending or self._pick_victim()
+        ):
+            worker = asyncio.create_task(self._worker(session))
+            self._workers.add(worker)
+            worker.add_done_callback(self._on_worker_done)
+
+    def _on_worker_done(self, worker: asyncio.Task):
+        self._workers.discard(worker)
+        if worker.cancelled():
+            return
+        if worker.exception():
+            self._events.put_nowait(worker.exception())
+        elif not self._workers:
+            self._events.put_nowait(None)
+
+    def _on_feeder_done(self, feeder: asyncio.Task):
+        if not feeder.cancelled() and feeder.exception():
+            self._events.put_nowait(feeder.exception())
 
-        self._join_parts()
-        self.cleanup()
-        yield 100.0
+    async def _worker(self, session):
+        while True:
+            if len(self._workers) > self._target_connections:
+                # Leave the set right away: workers that finish a range in
+                # the same iteration must not all retire on one decrease
+                self._workers.discard(asyncio.current_task())
+                return
+            # A range is only claimed once a connection is available, so
+            # workers queued on a global limit never look like slow ranges
+            async with self._connection_slot():
+                part = self._next_part()
+                if part is None:
+                    return
+
+                self._active[part["id"]] = {
+                    "part": part,
+                    "bytes": 0,
+                    "since": time.monotonic(),
+                }
+                try:
+                    await self._fetch_part(session, part)
+                finally:
+                    self._active.pop(part["id"], None)
+
+    def _next_part(self) -> Optional[dict]:
+        if self._pending:
+            return self._pending.pop(0)
+        return self._steal_part()
+
+    # -------------------------
+    # Work stealing
+    # -------------------------
+    def _pick_victim(self) -> Optional[dict]:
+        """Slowest running range that is still big enough to be halved."""
+        now = time.monotonic()
+        victim, victim_rate = None, 0.0
+
+        for stat in self._active.values():
+            part = stat["part"]
+            remaining = self._part_length(part) - part["written"]
+            if remaining < 2 * self.config.min_split_size:
+                continue
+            rate = stat["bytes"] / max(now - stat["since"], 1e-3)
+            if victim is None or rate < victim_rate:
+                victim, victim_rate = part, rate
+
+        return victim
+
+    def _steal_part(self) -> Optional[dict]:
+        victim = self._pick_victim()
+        if victim is None:
+            return None
+
+        remaining = self._part_length(victim) - victim["written"]
+        middle = victim["start"] + victim["written"] + remaining // 2
+        part = {
+            "id": max(p["id"] for p in self.parts) + 1,
+            "start": middle,
+            "end": victim["end"],
+            "written": 0,
+            "done": False,
+        }
+        # The victim notices its shorter range on the next chunk
+        victim["end"] = middle - 1
+        bisect.insort(self.parts, part, key=lambda p: p["start"])
+        self._save_state()
+
+        logger.debug(
+            f"Split part {victim['id']} at {middle} -> new part {part['id']}"
+        )
+        return part
+
+    # -------------------------
+    # Adaptive concurrency
+    # -------------------------
+    async def _adapt_connections(self, session):
+        """
+        Hill-climbs the connection count: keep adding connections while
+        each one raises total throughput, back off when throughput drops.
+        """
+        cfg = self.config
+        last_bytes = self._downloaded
+        last_rate: Optional[float] = None
+
+        while True:
+            await asyncio.sleep(cfg.adapt_interval)
+            rate = (self._downloaded - last_bytes) / cfg.adapt_interval
+            last_bytes = self._downloaded
+
+            if last_rate is None or rate > last_rate * (1 + cfg.adapt_threshold):
+                step = 1
+            elif rate < last_rate * (1 - cfg.adapt_threshold):
+                step = -1
+            else:
+                step = 0
+            last_rate = rate
+
+            target = min(
+                max(self._target_connections + step, cfg.min_connections),
+                cfg.max_connections,
+            )
+            if target != self._target_connections:
+                logger.debug(
+                    f"Connections {self._target_connections} -> {target} "
+                    f"at {rate / 1024 / 1024:.2f} MB/s"
+                )
+                self._target_connections = target
+                self._spawn_workers(session)
+
+    def _report_progress(self):
+        event = self._meter.update(self._downloaded, len(self._active))
+        if event:
+            self._events.put_nowait(event)
 
     async def _fetch_part(self, session, part) -> int:
-        headers = {"Range": f"bytes={part['start']}-{part['end']}"}
-        part_file = self._part_path(part["id"])
+        downloaded = 0
+
+        async def attempt():
+            nonlocal downloaded
+            downloaded += await self._fetch_range(session, part)
+
+        await _retry(attempt, f"Part {part['id']}")
+
+        part["done"] = True
+        self._save_state()
+        if self.sink:
+            self._feed_wakeup.set()
+        return downloaded
+
+    async def _fetch_range(self, session, part) -> int:
+        # Only the missing tail of the range is requested, on resume as
+        # well as on retry
+        start = part["start"] + part["written"]
+        headers = {"Range": f"bytes={start}-{part['end']}"}
+        stat = self._active.get(part["id"])
 
         async with session.get(self.url, headers=headers) as resp:
-            if resp.status != 206:
-                raise RuntimeError("Range lost")
+            _check_range_status(resp)
 
             downloaded = 0
-            with open(part_file, "wb") as f:
+            with self._open_part(part) as f:
                 async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    # The range may have been shortened by a split meanwhile
+                    remaining = self._part_length(part) - part["written"]
+                    if len(chunk) > remaining:
+                        chunk = chunk[:remaining]
+
                     f.write(chunk)
+                    part["written"] += len(chunk)
                     downloaded += len(chunk)
-
-        part["done"] = True
-        self._save_state()
+                    self._downloaded += len(chunk)
+                    if stat:
+                        stat["bytes"] += len(chunk)
+                    self._report_progress()
+                    if self.bandwidth:
+                        await self.bandwidth.consume(len(chunk))
+
+                    if self.sink:
+                        self._feed_wakeup.set()
+
+                    if part["written"] == self._part_length(part):
+                        break
+                    self._maybe_save_state()
+
+        length = self._part_length(part)
+        if part["written"] != length:
+            raise _TransientError(
+                f"Part {part['id']} incomplete: {part['written']}/{length} bytes"
+            )
         return downloaded
 
     # -------------------------
     # Single download
     # -------------------------
-    async def _download_single(self, session) -> AsyncGenerator[float, None]:
-        async with session.get(self.url) as resp:
+    async def _download_single(self, session) -> AsyncGenerator[DownloadProgress, None]:
+        if self.sink:
+            self.sink.reset()
+        async with self._connection_slot(), session.get(self.url) as resp:
             resp.raise_for_status()
             total = int(resp.headers.get("Content-Length", 0))
             downloaded = 0
+            meter = _ProgressMeter(total, 0, self.config)
 
-            with open(self.filename, "wb") as f:
+            with self._open_output() as f:
                 async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
-                    f.write(chunk)
+                    if self.sink:
+                        self.sink.write(chunk)
+                    else:
+                        f.write(chunk)
                     downloaded += len(chunk)
-                    if total:
-                        yield downloaded / total * 100
+                    event = meter.update(downloaded, 1)
+                    if event:
+                        yield event
+                    if self.bandwidth:
+                        await self.bandwidth.consume(len(chunk))
+
+            if self.sink:
+                self.sink.close()
+            else:
+                self.cleanup()
 
-        yield 100.0
+        meter.total = total or downloaded
+        yield meter.update(meter.total, 0, force=True)
 
     # -------------------------
     # Join + cleanup
@@ -193,27 +808,75 @@ class Downloader:
         if os.path.exists(self.meta_file):
             os.remove(self.meta_file)
 
+    def _open_output(self):
+        if self.sink:
+            return contextlib.nullcontext()
+        return open(self.filename, "wb")
+
+    def _open_part(self, part):
+        # Unbuffered handles: whatever `written` says has reached the OS,
+        # so a crash can't leave the state ahead of the data
+        if self.preallocate:
+            # Each range gets its own handle, so concurrent parts never
+            # share a file position
+            f = open(self.filename, "r+b", buffering=0)
+            f.seek(part["start"] + part["written"])
+            return f
+
+        part_file = self._part_path(part["id"])
+        f = open(part_file, "r+b" if os.path.exists(part_file) else "wb", buffering=0)
+        f.truncate(part["written"])
+        f.seek(part["written"])
+        return f
+
+    @staticmethod
+    def _part_length(part) -> int:
+        return part["end"] - part["start"] + 1
+
     def _part_path(self, part_id: int) -> str:
         return os.path.join(self.temp_dir, f"part{part_id}")
 
 
+# -------------------------
+# Shared session
+# -------------------------
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """
+    Session reused by every download on the background loop, so TCP/TLS
+    connections stay alive between calls. Must be called on that loop.
+    """
+    global _session
+    if _session is None or _session.closed:
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60)
+        _session = aiohttp.ClientSession(timeout=timeout)
+        get_background_loop().on_shutdown(close_shared_session)
+    return _session
+
+
+async def close_shared_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
 # -------------------------
 # Sync wrapper
 # -------------------------
-def download(url: str, filename: str) -> Iterator[float]:
+def download(
+    url: str, filename: str, sink: Optional[StreamSink] = None
+) -> Iterator[DownloadProgress]:
+    """
+    Runs the download on the shared background loop and yields progress
+    in the calling thread. Safe to call while another loop is running.
+    """
+
     async def run():
-        d = Downloader(url, filename)
+        d = Downloader(url, filename, sink=sink, session=get_shared_session())
         async for p in d.download():
             yield p
 
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    agen = run()
-
-    try:
-        while True:
-            yield loop.run_until_complete(agen.__anext__())
-    except StopAsyncIteration:
-        pass
-    finally:
-        loop.close()
+    yield from get_background_loop().iterate(run())
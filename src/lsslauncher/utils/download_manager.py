@@ -0,0 +1,317 @@
+import asyncio
+import heapq
+import itertools
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import CancelledError, Future
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from utils.background_loop import get_background_loop
+from utils.download import (
+    DownloadConfig,
+    DownloadProgress,
+    Downloader,
+    StreamSink,
+    TokenBucket,
+    get_shared_session,
+)
+
+MAX_CONNECTIONS = 8
+MAX_ACTIVE_JOBS = 2
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class DownloadJob:
+    def __init__(
+        self,
+        manager: "DownloadManager",
+        job_id: str,
+        url: str,
+        filename: str,
+        *,
+        sink: Optional[StreamSink] = None,
+        priority: int = 0,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+        finalize: Optional[Callable[[], None]] = None,
+        on_progress: Optional[Callable[["DownloadJob"], None]] = None,
+        on_done: Optional[Callable[["DownloadJob"], None]] = None,
+    ):
+        self.manager = manager
+        self.id = job_id
+        self.url = url
+        self.filename = filename
+        self.sink = sink
+        self.priority = priority
+        self.ranges = ranges
+        self.finalize = finalize
+        self.on_progress = on_progress
+        self.on_done = on_done
+
+        self.state = JobState.QUEUED
+        self.progress: Optional[DownloadProgress] = None
+        self.error: Optional[BaseException] = None
+        self.future: Future = Future()
+
+        self._updates: queue.Queue = queue.Queue()
+
+    # --------------------
+    # Controls
+    # --------------------
+
+    def pause(self):
+        self.manager.pause(self.id)
+
+    def resume(self):
+        self.manager.resume(self.id)
+
+    def cancel(self):
+        self.manager.cancel(self.id)
+
+    def wait(self, timeout: Optional[float] = None):
+        return self.future.result(timeout)
+
+    def __iter__(self) -> Iterator[DownloadProgress]:
+        """Blocks the calling thread and yields progress until the job ends."""
+        while True:
+            progress = self._updates.get()
+            if progress is None:
+                break
+            yield progress
+        self.future.result()
+
+    # --------------------
+    # Called on the manager loop
+    # --------------------
+
+    def _publish(self, progress: DownloadProgress):
+        self.progress = progress
+        self._updates.put(progress)
+        if self.on_progress:
+            try:
+                self.on_progress(self)
+            except Exception as exc:
+                logger.error(f"Progress callback for job '{self.id}' failed: {exc}")
+
+    def _finish(self, state: JobState, error: Optional[BaseException] = None):
+        self.state = state
+        self.error = error
+        if error:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(self)
+        self._updates.put(None)
+        if self.on_done:
+            try:
+                self.on_done(self)
+            except Exception as exc:
+                logger.error(f"Done callback for job '{self.id}' failed: {exc}")
+
+
+class DownloadManager:
+    """
+    Runs every pack download on the shared background loop with the shared
+    aiohttp session. Jobs are started by priority (lower runs first), share
+    a global connection cap and an optional bandwidth limit in bytes/s.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_active_jobs: int = MAX_ACTIVE_JOBS,
+        bandwidth_limit: Optional[float] = None,
+        config: Optional[DownloadConfig] = None,
+    ):
+        self.max_active_jobs = max_active_jobs
+        self.config = config or DownloadConfig(max_connections=max_connections)
+
+        self._loop = get_background_loop().loop
+        self._connections = asyncio.Semaphore(max_connections)
+        self._bandwidth = TokenBucket(bandwidth_limit)
+
+        self._queue: List[Tuple[int, int, DownloadJob]] = []
+        self._order = itertools.count()
+        self._jobs: Dict[str, DownloadJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        logger.info("DownloadManager started")
+
+    # --------------------
+    # Public API (any thread)
+    # --------------------
+
+    def submit(
+        self,
+        url: str,
+        filename: str,
+        *,
+        job_id: Optional[str] = None,
+        sink: Optional[StreamSink] = None,
+        priority: int = 0,
+        ranges: Optional[List[Tuple[int, int]]] = None,
+        finalize: Optional[Callable[[], None]] = None,
+        on_progress: Optional[Callable[[DownloadJob], None]] = None,
+        on_done: Optional[Callable[[DownloadJob], None]] = None,
+    ) -> DownloadJob:
+        job = DownloadJob(
+            self,
+            job_id or uuid.uuid4().hex,
+            url,
+            filename,
+            sink=sink,
+            priority=priority,
+            ranges=ranges,
+            finalize=finalize,
+            on_progress=on_progress,
+            on_done=on_done,
+        )
+        self._loop.call_soon_threadsafe(self._enqueue, job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[DownloadJob]:
+        return self._jobs.get(job_id)
+
+    def pause(self, job_id: str):
+        self._loop.call_soon_threadsafe(self._pause, job_id)
+
+    def resume(self, job_id: str):
+        self._loop.call_soon_threadsafe(self._resume, job_id)
+
+    def cancel(self, job_id: str):
+        self._loop.call_soon_threadsafe(self._cancel, job_id)
+
+    def set_bandwidth_limit(self, bytes_per_second: Optional[float]):
+        self._loop.call_soon_threadsafe(self._bandwidth.set_rate, bytes_per_second)
+
+    def close(self):
+        """Pauses running jobs; their .meta state lets them resume later."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        logger.info("DownloadManager stopped")
+
+    # --------------------
+    # Scheduling (manager loop)
+    # --------------------
+
+    def _enqueue(self, job: DownloadJob):
+        current = self._jobs.get(job.id)
+        if current and current.state in (
+            JobState.QUEUED,
+            JobState.RUNNING,
+            JobState.PAUSED,
+        ):
+            logger.warning(f"Job '{job.id}' is already active")
+            job._finish(JobState.CANCELLED, CancelledError())
+            return
+
+        self._jobs[job.id] = job
+        heapq.heappush(self._queue, (job.priority, next(self._order), job))
+        logger.info(f"Job '{job.id}' queued with priority {job.priority}")
+        self._schedule()
+
+    def _schedule(self):
+        while self._queue and len(self._tasks) < self.max_active_jobs:
+            _, _, job = heapq.heappop(self._queue)
+            if job.state != JobState.QUEUED or job.id in self._tasks:
+                continue
+            self._tasks[job.id] = self._loop.create_task(self._run(job))
+
+    def _pause(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if not job or job.state not in (JobState.QUEUED, JobState.RUNNING):
+            return
+        job.state = JobState.PAUSED
+        task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+        logger.info(f"Job '{job_id}' paused")
+
+    def _resume(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if not job or job.state != JobState.PAUSED:
+            return
+        job.state = JobState.QUEUED
+        heapq.heappush(self._queue, (job.priority, next(self._order), job))
+        logger.info(f"Job '{job_id}' resumed")
+        self._schedule()
+
+    def _cancel(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if not job or job.state in (JobState.DONE, JobState.FAILED, JobState.CANCELLED):
+            return
+        task = self._tasks.get(job_id)
+        job.state = JobState.CANCELLED
+        if task:
+            # _run finishes the job once the downloader has unwound
+            task.cancel()
+        else:
+            self._discard(job)
+            job._finish(JobState.CANCELLED, CancelledError())
+        logger.info(f"Job '{job_id}' cancelled")
+
+    async def _run(self, job: DownloadJob):
+        job.state = JobState.RUNNING
+        downloader = Downloader(
+            job.url,
+            job.filename,
+            sink=job.sink,
+            config=self.config,
+            session=get_shared_session(),
+            connection_limit=self._connections,
+            bandwidth=self._bandwidth,
+            ranges=job.ranges,
+        )
+        try:
+            async for progress in downloader.download():
+                job._publish(progress)
+            if job.finalize:
+                await asyncio.to_thread(job.finalize)
+        except asyncio.CancelledError:
+            if job.state == JobState.CANCELLED:
+                self._discard(job)
+                job._finish(JobState.CANCELLED, CancelledError())
+        except Exception as exc:
+            logger.error(f"Job '{job.id}' failed: {exc}")
+            if job.sink:
+                job.sink.discard()
+            job._finish(JobState.FAILED, exc)
+        else:
+            logger.success(f"Job '{job.id}' finished")
+            job._finish(JobState.DONE)
+        finally:
+            self._tasks.pop(job.id, None)
+            self._schedule()
+
+    def _discard(self, job: DownloadJob):
+        if job.sink:
+            job.sink.discard()
+        # Drops .meta / .parts left behind by a paused download
+        Downloader(job.url, job.filename).cleanup()
+        if os.path.exists(job.filename):
+            os.remove(job.filename)
+
+    async def _shutdown(self):
+        for job_id in list(self._tasks):
+            self._pause(job_id)
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+_manager: Optional[DownloadManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_download_manager() -> DownloadManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DownloadManager()
+        return _manager
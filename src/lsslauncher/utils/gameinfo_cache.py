@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import requests
+from loguru import logger
+from utils.helpers import get_folder
+
+GAMEINFO_URL = "https://raw.githubusercontent.com/SteamDatabase/GameTracking-Dota2/refs/heads/master/game/dota/gameinfo_branchspecific.gi"
+GAMEINFO_TIMEOUT = 10
+GAMEINFO_CACHE_PATH = Path(get_folder()) / "cache" / "gameinfo"
+GAMEINFO_MAX_AGE = 6 * 60 * 60  # revalidate upstream every six hours
+GAMEINFO_VERSIONS = 3  # older copies kept next to the current one
+
+
+class DefaultGameInfo:
+    """
+    Local copy of the upstream default gameinfo_branchspecific.gi. Each
+    version is stored under its SHA1 and `current.json` points at the
+    newest one. Reads never wait on the network when a copy exists: stale
+    copies are revalidated in the background with If-None-Match.
+    """
+
+    def __init__(
+        self,
+        url: str = GAMEINFO_URL,
+        path: Path = GAMEINFO_CACHE_PATH,
+        max_age: float = GAMEINFO_MAX_AGE,
+    ):
+        self.url = url
+        self.path = path
+        self.max_age = max_age
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gameinfo")
+        self._refresh: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def get(self, fallback: Optional[bytes] = None) -> Optional[bytes]:
+        """
+        Cached default gi. Without a cached copy, `fallback` (e.g. the
+        game's current unpatched gi) is used while the download runs in
+        the background; only when there is neither does it fetch
+        synchronously.
+        """
+        meta = self._read_meta()
+        content = self._read_version(meta)
+        if content is not None:
+            if time.time() - meta["fetched_at"] > self.max_age:
+                self.refresh_async()
+            return content
+
+        if fallback is not None:
+            logger.info("No cached default gi yet, using the game's own")
+            self.refresh_async()
+            return fallback
+
+        self.refresh()
+        return self._read_version(self._read_meta())
+
+    def refresh(self) -> bool:
+        """Revalidates the cached copy. Returns True if a copy is available."""
+        meta = self._read_meta()
+        headers = {}
+        if meta and meta.get("etag") and self._read_version(meta) is not None:
+            headers["If-None-Match"] = meta["etag"]
+
+        try:
+            response = requests.get(self.url, headers=headers, timeout=GAMEINFO_TIMEOUT)
+            if response.status_code == 304 and meta:
+                meta["fetched_at"] = time.time()
+                self._write_meta(meta)
+                logger.info("Default gi is up to date")
+                return True
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"While dowload gi file exception {e}")
+            return meta is not None
+
+        content = response.content
+        sha1 = hashlib.sha1(content).hexdigest()
+        self.path.mkdir(parents=True, exist_ok=True)
+        version_path = self.path / f"{sha1}.gi"
+        if not version_path.exists():
+            tmp = version_path.with_suffix(".tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, version_path)
+            logger.success(f"New default gi version {sha1[:8]}")
+
+        self._write_meta(
+            {
+                "sha1": sha1,
+                "etag": response.headers.get("ETag"),
+                "fetched_at": time.time(),
+            }
+        )
+        self._prune(keep=sha1)
+        return True
+
+    def refresh_async(self) -> Future:
+        with self._lock:
+            if self._refresh is None or self._refresh.done():
+                self._refresh = self._pool.submit(self.refresh)
+            return self._refresh
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            return json.loads((self.path / "current.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta: dict):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / "current.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.path / "current.json")
+
+    def _read_version(self, meta: Optional[dict]) -> Optional[bytes]:
+        if not meta:
+            return None
+        try:
+            content = (self.path / f"{meta['sha1']}.gi").read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha1(content).hexdigest() != meta["sha1"]:
+            logger.warning("Cached default gi is corrupted")
+            return None
+        return content
+
+    def _prune(self, keep: str):
+        versions = sorted(
+            (p for p in self.path.glob("*.gi") if p.stem != keep),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for old in versions[GAMEINFO_VERSIONS - 1:]:
+            old.unlink(missing_ok=True)
+
+
+_default_gameinfo: Optional[DefaultGameInfo] = None
+_default_gameinfo_lock = threading.Lock()
+
+
+def get_default_gameinfo() -> DefaultGameInfo:
+    global _default_gameinfo
+    with _default_gameinfo_lock:
+        if _default_gameinfo is None:
+            _default_gameinfo = DefaultGameInfo()
+        return _default_gameinfo
@@ -0,0 +1,115 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Union
+
+from loguru import logger
+from utils.hashing import hash_file
+from utils.helpers import get_folder
+
+HASH_CACHE_PATH = Path(get_folder()) / "cache" / "hashes.sqlite3"
+# A file written within this window of being hashed could change again
+# without its mtime moving, so such results are not cached
+RACY_WINDOW_NS = 2 * 10**9
+
+PathLike = Union[str, Path]
+
+
+class HashCache:
+    """
+    Persistent file digests keyed by (path, size, mtime_ns, inode). A hit
+    costs one stat call; any change to the file's identity re-hashes it.
+    """
+
+    def __init__(self, path: Path = HASH_CACHE_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    digests TEXT NOT NULL
+                )
+                """
+            )
+
+    def hash_file(
+        self, path: PathLike, algorithms: Sequence[str] = ("md5",)
+    ) -> Dict[str, str]:
+        key = self._key(path)
+        st = os.stat(path)
+        identity = (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        cached = self._load(key, identity)
+        if cached is not None and all(name in cached for name in algorithms):
+            return {name: cached[name] for name in algorithms}
+
+        missing = [name for name in algorithms if name not in (cached or {})]
+        digests = dict(cached or {}, **hash_file(path, missing))
+
+        # Only trust the result if the file didn't change while being read
+        st_after = os.stat(path)
+        if (st_after.st_size, st_after.st_mtime_ns, st_after.st_ino) == identity:
+            if time.time_ns() - st.st_mtime_ns > RACY_WINDOW_NS:
+                self._store(key, identity, digests)
+        return {name: digests[name] for name in algorithms}
+
+    def invalidate(self, path: PathLike):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM hashes WHERE path = ?", (self._key(path),))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _key(path: PathLike) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    def _load(self, key: str, identity: tuple) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, inode, digests FROM hashes WHERE path = ?",
+                (key,),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != identity:
+            return None
+        return json.loads(row[3])
+
+    def _store(self, key: str, identity: tuple, digests: Dict[str, str]):
+        try:
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, digests) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, *identity, json.dumps(digests)),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to cache digests of {key}: {e}")
+
+
+_cache: Optional[HashCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_hash_cache() -> HashCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HashCache()
+        return _cache
+
+
+def cached_hash_file(
+    path: PathLike, algorithms: Sequence[str] = ("md5",)
+) -> Dict[str, str]:
+    return get_hash_cache().hash_file(path, algorithms)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+from loguru import logger
+
+# hashlib and zlib release the GIL for large buffers, so with 1 MB reads
+# the digests run in parallel across files on a thread pool
+HASH_BUFFER_SIZE = 1024 * 1024
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+ALGORITHMS = ("md5", "sha1", "sha256", "crc32")
+
+PathLike = Union[str, Path]
+
+
+def hash_file(
+    path: PathLike,
+    algorithms: Sequence[str] = ("md5",),
+    buffer_size: int = HASH_BUFFER_SIZE,
+) -> Dict[str, str]:
+    """
+    Computes every requested digest in a single read of the file.
+    Returns lowercase hex strings; crc32 is the big-endian 8-digit value.
+    """
+    unknown = set(algorithms) - set(ALGORITHMS)
+    if unknown:
+        raise ValueError(f"Unsupported hash algorithms: {', '.join(sorted(unknown))}")
+
+    digests = {name: hashlib.new(name) for name in algorithms if name != "crc32"}
+    updates = [digest.update for digest in digests.values()]
+    crc = 0 if "crc32" in algorithms else None
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while n := f.readinto(buffer):
+            chunk = view[:n]
+            for update in updates:
+                update(chunk)
+            if crc is not None:
+                crc = zlib.crc32(chunk, crc)
+
+    result = {name: digest.hexdigest() for name, digest in digests.items()}
+    if crc is not None:
+        result["crc32"] = f"{crc & 0xFFFFFFFF:08x}"
+    return result
+
+
+def hash_files(
+    paths: Iterable[PathLike],
+    algorithms: Sequence[str] = ("md5",),
+    max_workers: Optional[int] = None,
+) -> Dict[str, Dict[str, str]]:
+    """Hashes several files concurrently. Files that can't be read are skipped."""
+    paths = [str(path) for path in paths]
+    result: Dict[str, Dict[str, str]] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers or HASH_WORKERS, thread_name_prefix="hash"
+    ) as pool:
+        futures = {path: pool.submit(hash_file, path, algorithms) for path in paths}
+        for path, future in futures.items():
+            try:
+                result[path] = future.result()
+            except OSError as e:
+                logger.error(f"Failed to hash {path}: {e}")
+    return result
+
+
+def file_md5(path: PathLike) -> str:
+    return hash_file(path, ("md5",))["md5"]
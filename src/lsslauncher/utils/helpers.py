@@ -33,6 +33,39 @@ def human_readable_size(num_bytes: int, decimal_places: int = 2) -> str:
     return f"{calc_bytes:.{decimal_places}f} PB"
 
 
+def parse_readable_size(text: str) -> int:
+    """
+    Обратное преобразование к human_readable_size.
+
+    :param text: строка вида '10.23 MB' или '512'
+    :return: количество байтов
+    """
+    parts = text.strip().upper().split()
+    if not parts:
+        raise ValueError("Пустая строка размера")
+
+    value = float(parts[0])
+    unit = parts[1] if len(parts) > 1 else "B"
+    units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']
+    if unit not in units:
+        raise ValueError(f"Неизвестная единица размера: {unit}")
+    return int(value * 1000 ** units.index(unit))
+
+
+def stat_record(path) -> dict[str, int]|None:
+    """
+    Отпечаток файла для быстрой проверки изменений без чтения содержимого.
+
+    :param path: путь к файлу
+    :return: словарь с размером и mtime_ns или None, если файла нет
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
 def open_folder(path):
     
     if platform.system() == "Windows":
@@ -1,16 +1,61 @@
+import ctypes
 import hashlib
+import os
 import platform
 import subprocess
+import threading
+from pathlib import Path
+from typing import Optional
 
-def get_hwid(salt: str = '') -> str:
+from utils.helpers import get_folder
+
+# Only persisted on Windows, where the lookup spawns wmi/powershell and
+# DPAPI keeps the file bound to the user; elsewhere it is cheap to redo
+HWID_CACHE_PATH = Path(get_folder()) / "cache" / "hwid.bin"
+HWID_ENTROPY = b"LSSLauncher hwid"
+CRYPTPROTECT_UI_FORBIDDEN = 0x01
+FALLBACK_UUID = "example"
+
+_hwid: Optional[str] = None
+_hwid_lock = threading.Lock()
+
+
+def _linux_root_uuid() -> Optional[str]:
     """
-    Возвращает кроссплатформенный уникальный идентификатор машины (HWID)
+    UUID of the filesystem mounted at / (what `blkid` reported before),
+    read from /proc and /dev/disk/by-uuid without spawning processes.
     """
-    
+    device = None
+    with open("/proc/self/mounts") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) > 1 and fields[1] == "/":
+                device = fields[0]
+    if not device or not device.startswith("/dev/"):
+        return None
+
+    device = os.path.realpath(device)
+    by_uuid = Path("/dev/disk/by-uuid")
+    for link in by_uuid.iterdir():
+        if os.path.realpath(link) == device:
+            return link.name
+    return None
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.readline().strip() or None
+    except OSError:
+        return None
+
+
+def _machine_uuid() -> Optional[str]:
+    system = platform.system()
     uuid_str = None
-    if platform.system() == "Windows":
+    if system == "Windows":
         import wmi
-        
+
         try:
             uuid_str = wmi.WMI().Win32_ComputerSystemProduct()[0].UUID
         except:
@@ -22,19 +67,99 @@ def get_hwid(salt: str = '') -> str:
                 uuid_str = output.strip()
             except:
                 pass
-    else:
-        # На Linux/Mac можно использовать disk UUID
+    elif system == "Linux":
+        # Root filesystem UUID first, so existing HWIDs don't change
         try:
-            if platform.system() == "Linux":
-                output = subprocess.check_output("blkid -o value -s UUID $(df / | tail -1 | awk '{print $1}')", shell=True)
-                uuid_str = output.decode().strip()
-            elif platform.system() == "Darwin":
-                output = subprocess.check_output("ioreg -rd1 -c IOPlatformExpertDevice | grep IOPlatformUUID", shell=True)
-                uuid_str = output.decode().split('=')[1].strip().strip('"')
+            uuid_str = _linux_root_uuid()
+        except OSError:
+            pass
+        for path in ("/etc/machine-id", "/var/lib/dbus/machine-id", "/sys/class/dmi/id/product_uuid"):
+            if uuid_str:
+                break
+            uuid_str = _read_first_line(path)
+    elif system == "Darwin":
+        try:
+            output = subprocess.check_output(
+                ["ioreg", "-rd1", "-c", "IOPlatformExpertDevice"], text=True
+            )
+            for line in output.splitlines():
+                if "IOPlatformUUID" in line:
+                    uuid_str = line.split('=')[1].strip().strip('"')
         except:
             pass
-    if not uuid_str:
-        uuid_str = "example"
-    # Хешируем все данные, чтобы получить короткий HWID
-    hwid = hashlib.sha256(uuid_str.encode()).hexdigest()
-    return hwid
\ No newline at end of file
+    return uuid_str
+
+
+class _DataBlob(ctypes.Structure):
+    _fields_ = [("cbData", ctypes.c_uint32), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+
+def _dpapi(data: bytes, protect: bool) -> Optional[bytes]:
+    """CryptProtectData / CryptUnprotectData for the current Windows user."""
+    buffer = ctypes.create_string_buffer(data, len(data))
+    blob_in = _DataBlob(len(data), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char)))
+    entropy = ctypes.create_string_buffer(HWID_ENTROPY, len(HWID_ENTROPY))
+    blob_entropy = _DataBlob(
+        len(HWID_ENTROPY), ctypes.cast(entropy, ctypes.POINTER(ctypes.c_char))
+    )
+    blob_out = _DataBlob()
+    crypt32 = ctypes.windll.crypt32
+    func = crypt32.CryptProtectData if protect else crypt32.CryptUnprotectData
+    if not func(
+        ctypes.byref(blob_in), None, ctypes.byref(blob_entropy), None, None,
+        CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(blob_out),
+    ):
+        return None
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+
+def _load_cached() -> Optional[str]:
+    try:
+        data = _dpapi(HWID_CACHE_PATH.read_bytes(), protect=False)
+    except OSError:
+        return None
+    # Only DPAPI for this user can produce a blob that decrypts
+    if data is None or len(data) != 64:
+        return None
+    hwid = data.decode("ascii", errors="ignore")
+    return hwid if all(c in "0123456789abcdef" for c in hwid) else None
+
+
+def _save_cached(hwid: str):
+    try:
+        data = _dpapi(hwid.encode(), protect=True)
+        if data is None:
+            return
+        HWID_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = HWID_CACHE_PATH.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, HWID_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def get_hwid(salt: str = '') -> str:
+    """
+    Возвращает кроссплатформенный уникальный идентификатор машины (HWID).
+    Вычисляется один раз за процесс; на Windows сохраняется в кэш-файле,
+    зашифрованном DPAPI.
+    """
+    global _hwid
+    if _hwid is not None:
+        return _hwid
+
+    with _hwid_lock:
+        if _hwid is None:
+            persist = platform.system() == "Windows"
+            hwid = _load_cached() if persist else None
+            if hwid is None:
+                uuid_str = _machine_uuid()
+                # Хешируем все данные, чтобы получить короткий HWID
+                hwid = hashlib.sha256((uuid_str or FALLBACK_UUID).encode()).hexdigest()
+                if uuid_str and persist:
+                    _save_cached(hwid)
+            _hwid = hwid
+    return _hwid
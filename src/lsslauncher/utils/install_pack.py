@@ -1,15 +1,19 @@
+import json
 import os
 import platform
 from utils.api import API
-import shutil
-from utils.dota_patcher import restore_dota, patch_dota as patch_d, DOTA_MOD_FOLDER
-from utils.helpers import get_folder
+from utils.dota_patcher import restore_dota, patch_dota as patch_d, DOTA_MOD_FOLDER, INSTALL_MANIFEST
+from utils.helpers import get_folder, stat_record
+from utils.pack_store import get_pack_store, read_install_manifest
+from utils.steam_library import get_library_finder
 from pathlib import Path
 import subprocess
-from typing import Union
+from typing import Callable, Optional, Union
 from loguru import logger
 
 APP_DATA_PATH: str = str(Path(get_folder()) / "packs")
+INSTALL_CHUNK_SIZE = 8 * 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl: share the source's extents (btrfs, XFS)
 GAMEINFO_SPECIFICBRANCH = "https://raw.githubusercontent.com/SteamDatabase/GameTracking-Dota2/refs/heads/master/game/dota/gameinfo_branchspecific.gi"
 
 
@@ -19,86 +23,151 @@ def get_dota2_install_path():
     Works on Windows, macOS, and Linux.
     """
     logger.info("Searching for Dota 2 installation path...")
-    system = platform.system()
+    try:
+        dota_path = get_library_finder().find_dota()
+    except Exception as e:
+        logger.error(f"Failed to detect Dota 2 installation path: {e}")
+        return None
 
-    if system == 'Windows':
-        import winreg
+    if dota_path is None:
+        logger.warning("Dota 2 installation path not found")
+    return dota_path
+
+
+def _reflink(src: Path, dest: Path):
+    if platform.system() != "Linux":
+        raise OSError("Reflinks are only supported on Linux")
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
         try:
-            reg_path = r'Software\Valve\Steam'
-            try:
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:  # type: ignore
-                    steam_path = winreg.QueryValueEx(key, 'SteamPath')[0]  # type: ignore
-            except FileNotFoundError:
-                steam_path = os.path.expandvars(r'%ProgramFiles(x86)%\Steam')
-            dota_path = os.path.join(steam_path, 'steamapps', 'common', 'dota 2 beta')
-            if os.path.exists(dota_path):
-                logger.info(f"Dota 2 found at {dota_path}")
-                return str(Path(dota_path).resolve())
-            vdf_path = os.path.join(steam_path, 'steamapps', 'libraryfolders.vdf')
-            if os.path.exists(vdf_path):
-                with open(vdf_path, 'r') as f:
-                    lines = f.readlines()
-                for line in lines:
-                    if '"path"' in line:
-                        lib_path = line.split('"')[-2].replace('\\\\', '\\')
-                        dota_path = os.path.join(lib_path, 'steamapps', 'common', 'dota 2 beta')
-                        if os.path.exists(dota_path):
-                            logger.info(f"Dota 2 found at {dota_path}")
-                            return str(Path(dota_path).resolve())
-        except Exception as e:
-            logger.error(f"Failed to detect Dota 2 installation path: {e}")
-
-    elif system == 'Darwin':  # macOS
-        steam_path = os.path.expanduser('~/Library/Application Support/Steam')
-        dota_path = os.path.join(steam_path, 'steamapps', 'common', 'dota 2 beta')
-        if os.path.exists(dota_path):
-            logger.info(f"Dota 2 found at {dota_path}")
-            return str(Path(dota_path).resolve())
-        vdf_path = os.path.join(steam_path, 'steamapps', 'libraryfolders.vdf')
-        if os.path.exists(vdf_path):
-            with open(vdf_path, 'r') as f:
-                lines = f.readlines()
-            for line in lines:
-                if '"path"' in line:
-                    lib_path = line.split('"')[-2]
-                    dota_path = os.path.join(lib_path, 'steamapps', 'common', 'dota 2 beta')
-                    if os.path.exists(dota_path):
-                        logger.info(f"Dota 2 found at {dota_path}")
-                        return str(Path(dota_path).resolve())
-
-    elif system == 'Linux':
-        steam_paths = [os.path.expanduser('~/.steam/steam'), os.path.expanduser('~/.local/share/Steam')]
-        for steam_path in steam_paths:
-            dota_path = os.path.join(steam_path, 'steamapps', 'common', 'dota 2 beta')
-            if os.path.exists(dota_path):
-                logger.info(f"Dota 2 found at {dota_path}")
-                return str(Path(dota_path).resolve())
-            vdf_path = os.path.join(steam_path, 'steamapps', 'libraryfolders.vdf')
-            if os.path.exists(vdf_path):
-                with open(vdf_path, 'r') as f:
-                    lines = f.readlines()
-                for line in lines:
-                    if '"path"' in line:
-                        lib_path = line.split('"')[-2]
-                        dota_path = os.path.join(lib_path, 'steamapps', 'common', 'dota 2 beta')
-                        if os.path.exists(dota_path):
-                            logger.info(f"Dota 2 found at {dota_path}")
-                            return str(Path(dota_path).resolve())
-
-    logger.warning("Dota 2 installation path not found")
-    return None
-
-
-def install_pack(uuid: str, dota_path: Union[str, Path], api: API):
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            pass
+        # copy_file_range stays in the kernel and reflinks where it can
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        while copied < size:
+            n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+            if n == 0:
+                raise OSError("copy_file_range stopped early")
+            copied += n
+
+
+def _chunked_copy(
+    src: Path,
+    dest: Path,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+):
+    total = src.stat().st_size
+    copied = 0
+    with open(src, "rb", buffering=0) as fsrc, open(dest, "wb", buffering=0) as fdst:
+        buffer = bytearray(INSTALL_CHUNK_SIZE)
+        view = memoryview(buffer)
+        while True:
+            n = fsrc.readinto(buffer)
+            if not n:
+                break
+            fdst.write(view[:n])
+            copied += n
+            if on_progress:
+                on_progress(copied, total)
+
+
+def place_file(
+    src: Union[str, Path],
+    dest: Union[str, Path],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """
+    Puts src at dest without copying data when possible: hardlink, then
+    reflink, then symlink (same filesystem only), falling back to a chunked
+    copy that reports (copied, total). dest is replaced atomically.
+    Returns the method used.
+    """
+    src, dest = Path(src), Path(dest)
+    tmp = dest.with_name(dest.name + ".tmp")
+    same_fs = os.stat(src).st_dev == os.stat(dest.parent).st_dev
+
+    methods = []
+    if same_fs:
+        methods.append(("hardlink", lambda: os.link(src, tmp)))
+    methods.append(("reflink", lambda: _reflink(src, tmp)))
+    if same_fs:
+        methods.append(("symlink", lambda: os.symlink(src.resolve(), tmp)))
+    methods.append(("copy", lambda: _chunked_copy(src, tmp, on_progress)))
+
+    for method, place in methods:
+        tmp.unlink(missing_ok=True)
+        try:
+            place()
+        except (OSError, NotImplementedError) as e:
+            logger.debug(f"{method} failed for {dest.name}: {e}")
+            continue
+        os.replace(tmp, dest)
+        if on_progress and method != "copy":
+            size = src.stat().st_size
+            on_progress(size, size)
+        logger.info(f"Placed {dest.name} via {method}")
+        return method
+
+    tmp.unlink(missing_ok=True)
+    raise OSError(f"Failed to place {src} at {dest}")
+
+
+def _install_state(dota_path: Path, vpk_file: Path, dest_vpk: Path) -> dict:
+    """Stat fingerprints of everything an install touches."""
+    game_path = dota_path / "game"
+    return {
+        "pack": stat_record(vpk_file),
+        "vpk": stat_record(dest_vpk),
+        "gameinfo": stat_record(game_path / "dota" / "gameinfo_branchspecific.gi"),
+        "signatures": stat_record(game_path / "bin" / "win64" / "dota.signatures"),
+    }
+
+
+def is_pack_installed(uuid: str, dota_path: Union[str, Path]) -> bool:
+    """True if `uuid` is the active pack and nothing changed since install."""
+    dota_path = Path(dota_path)
+    manifest = read_install_manifest(dota_path)
+    if manifest is None or manifest.get("id") != uuid:
+        return False
+    dest_vpk = dota_path / "game" / DOTA_MOD_FOLDER / "pak01_dir.vpk"
+    state = _install_state(dota_path, Path(APP_DATA_PATH) / uuid, dest_vpk)
+    return None not in state.values() and manifest.get("state") == state
+
+
+def install_pack(
+    uuid: str,
+    dota_path: Union[str, Path],
+    api: API,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+):
     dota_path = Path(dota_path)
     data_path = Path(APP_DATA_PATH)
     vpk_file = data_path / uuid
     vpk_folder = dota_path / "game" / DOTA_MOD_FOLDER
+    get_pack_store().touch(uuid)
+    if is_pack_installed(uuid, dota_path):
+        logger.info(f"Pack '{uuid}' is already installed, nothing to do")
+        return
     vpk_folder.mkdir(parents=True, exist_ok=True)
     logger.info(f"Installing pack '{uuid}' to {vpk_folder}")
-    patch_d(dota_path=str(dota_path))
+    manifest_path = vpk_folder / INSTALL_MANIFEST
+    manifest_path.unlink(missing_ok=True)
+    patched = patch_d(dota_path=str(dota_path)) != 1
     dest_vpk = vpk_folder / "pak01_dir.vpk"
-    shutil.copyfile(vpk_file, dest_vpk)
+    place_file(vpk_file, dest_vpk, on_progress)
+    if patched:
+        manifest = {
+            "id": uuid,
+            "hash": get_pack_store().digest(uuid),
+            "state": _install_state(dota_path, vpk_file, dest_vpk),
+        }
+        tmp = manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, manifest_path)
     logger.success(f"Pack '{uuid}' installed successfully")
 
 
@@ -0,0 +1,254 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from loguru import logger
+from utils.dota_patcher import DOTA_MOD_FOLDER, INSTALL_MANIFEST
+from utils.hashing import file_md5
+from utils.helpers import get_folder, human_readable_size
+from utils.steam_library import get_library_finder
+
+STORE_PATH = Path(get_folder()) / "store"
+PACKS_PATH = Path(get_folder()) / "packs"
+MAX_STORE_SIZE = 20 * 1000**3  # 20 GB
+
+
+def read_install_manifest(dota_path: Union[str, Path]) -> Optional[dict]:
+    manifest_path = Path(dota_path) / "game" / DOTA_MOD_FOLDER / INSTALL_MANIFEST
+    try:
+        return json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def installed_pack() -> Optional[str]:
+    """Name of the pack lss_install.json says the game is using, if any."""
+    try:
+        dota_path = get_library_finder().find_dota()
+    except Exception as e:
+        logger.warning(f"Can't locate Dota 2 to find the installed pack: {e}")
+        return None
+    manifest = read_install_manifest(dota_path) if dota_path else None
+    return manifest.get("id") if manifest else None
+
+
+class PackStore:
+    """
+    Content-addressed pack storage. Every pack or mix is a small manifest
+    pointing at an object named by the MD5 of its content (the digest the
+    server already publishes), so identical packs and repeated mixes share
+    one blob. `packs/<name>` stays a hardlink to the object, so existing
+    paths keep working without a second copy.
+    """
+
+    def __init__(
+        self,
+        root: Path = STORE_PATH,
+        packs_path: Path = PACKS_PATH,
+        max_size: int = MAX_STORE_SIZE,
+    ):
+        self.root = root
+        self.packs_path = packs_path
+        self.max_size = max_size
+        self.objects_path = root / "objects"
+        self.manifests_path = root / "manifests"
+        self._lock = threading.RLock()
+
+        self.objects_path.mkdir(parents=True, exist_ok=True)
+        self.manifests_path.mkdir(parents=True, exist_ok=True)
+        self.packs_path.mkdir(parents=True, exist_ok=True)
+
+    # --------------------
+    # Packs
+    # --------------------
+
+    def add(
+        self,
+        name: str,
+        path: Path,
+        digest: Optional[str] = None,
+        kind: str = "pack",
+        parents: Iterable[str] = (),
+    ) -> Path:
+        """
+        Moves `path` into the store (or drops it if the content is already
+        there) and links it back as packs/<name>. Returns the object path.
+        """
+        digest = digest or file_md5(path)
+        with self._lock:
+            obj = self._object_path(digest)
+            if obj.exists():
+                logger.info(f"Pack '{name}' deduplicated against {digest}")
+                if Path(path).resolve() != obj.resolve():
+                    Path(path).unlink(missing_ok=True)
+            else:
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, obj)
+                logger.info(f"Stored pack '{name}' as {digest}")
+            self._register(name, digest, kind, parents)
+        return obj
+
+    def adopt(
+        self,
+        name: str,
+        digest: str,
+        kind: str = "pack",
+        parents: Iterable[str] = (),
+    ) -> Optional[Path]:
+        """
+        Registers `name` for content that is already stored, e.g. a pack
+        republished under another id. Returns None if the object is unknown.
+        """
+        with self._lock:
+            obj = self._object_path(digest)
+            if not obj.exists():
+                return None
+            logger.info(f"Pack '{name}' already stored as {digest}")
+            self._register(name, digest, kind, parents)
+        return obj
+
+    def get(self, name: str) -> Optional[Path]:
+        """Path of the pack's object, marking it as recently used."""
+        with self._lock:
+            manifest = self._read_manifest(name)
+            if manifest is None:
+                return None
+            obj = self._object_path(manifest["object"])
+            if not obj.exists():
+                logger.warning(f"Object for pack '{name}' is missing")
+                self.remove(name)
+                return None
+            manifest["last_used"] = time.time()
+            self._write_manifest(name, manifest)
+            return obj
+
+    def digest(self, name: str) -> Optional[str]:
+        manifest = self._read_manifest(name)
+        return manifest["object"] if manifest else None
+
+    def touch(self, name: str):
+        self.get(name)
+
+    def remove(self, name: str):
+        with self._lock:
+            (self.manifests_path / f"{name}.json").unlink(missing_ok=True)
+            (self.packs_path / name).unlink(missing_ok=True)
+        logger.info(f"Pack '{name}' removed from store")
+
+    def manifests(self) -> List[dict]:
+        result = []
+        for manifest_file in self.manifests_path.glob("*.json"):
+            try:
+                result.append(json.loads(manifest_file.read_text()))
+            except (OSError, ValueError):
+                logger.warning(f"Skipping unreadable manifest {manifest_file}")
+        return result
+
+    # --------------------
+    # Garbage collection
+    # --------------------
+
+    def gc(self, keep: Iterable[str] = ()) -> int:
+        """
+        Evicts least recently used packs until the store fits max_size,
+        never touching the names in `keep` or the installed pack, then
+        deletes unreferenced objects. Returns the number of bytes freed.
+        """
+        keep = set(keep)
+        installed = installed_pack()
+        if installed:
+            keep.add(installed)
+        freed = 0
+        with self._lock:
+            manifests = sorted(self.manifests(), key=lambda m: m["last_used"])
+            refs: Dict[str, int] = {}
+            for manifest in manifests:
+                refs[manifest["object"]] = refs.get(manifest["object"], 0) + 1
+
+            total = sum(self._object_size(digest) for digest in refs)
+            for manifest in manifests:
+                if total <= self.max_size:
+                    break
+                if manifest["name"] in keep:
+                    continue
+                self.remove(manifest["name"])
+                refs[manifest["object"]] -= 1
+                if refs[manifest["object"]] == 0:
+                    total -= self._object_size(manifest["object"])
+
+            for obj in self.objects_path.glob("*/*"):
+                if refs.get(obj.name, 0) == 0:
+                    freed += obj.stat().st_size
+                    obj.unlink()
+                    logger.info(f"Deleted unreferenced object {obj.name}")
+
+        if freed:
+            logger.success(f"Store GC freed {human_readable_size(freed)}")
+        return freed
+
+    # --------------------
+    # Internals
+    # --------------------
+
+    def _register(self, name: str, digest: str, kind: str, parents: Iterable[str]):
+        obj = self._object_path(digest)
+        now = time.time()
+        self._write_manifest(
+            name,
+            {
+                "name": name,
+                "object": digest,
+                "size": obj.stat().st_size,
+                "kind": kind,
+                "parents": list(parents),
+                "created": now,
+                "last_used": now,
+            },
+        )
+        self._link(obj, self.packs_path / name)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_path / digest[:2] / digest
+
+    def _object_size(self, digest: str) -> int:
+        obj = self._object_path(digest)
+        return obj.stat().st_size if obj.exists() else 0
+
+    def _read_manifest(self, name: str) -> Optional[dict]:
+        try:
+            return json.loads((self.manifests_path / f"{name}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, name: str, manifest: dict):
+        target = self.manifests_path / f"{name}.json"
+        tmp = target.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, target)
+
+    @staticmethod
+    def _link(obj: Path, dest: Path):
+        tmp = dest.with_name(dest.name + ".link")
+        tmp.unlink(missing_ok=True)
+        try:
+            os.link(obj, tmp)
+        except OSError:
+            # No hardlinks here (e.g. FAT32), fall back to a real copy
+            shutil.copyfile(obj, tmp)
+        os.replace(tmp, dest)
+
+
+_store: Optional[PackStore] = None
+_store_lock = threading.Lock()
+
+
+def get_pack_store() -> PackStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PackStore()
+        return _store
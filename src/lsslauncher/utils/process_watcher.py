@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import psutil
+from loguru import logger
+
+PROCESS_PREFIX = "dota2"
+CHECK_INTERVAL = 2.0  # tracked PID liveness check
+SCAN_INTERVAL = 10.0  # full process table scan while the game isn't running
+
+Listener = Callable[[bool, Optional[int]], None]
+
+
+class ProcessWatcher:
+    """
+    Tracks the game process. A full process table scan happens only while
+    the game isn't known to be running; once found, its PID (plus creation
+    time, against PID reuse) is checked directly. Listeners get
+    (running, pid) on every start/exit, from the watcher thread.
+    """
+
+    def __init__(
+        self,
+        prefix: str = PROCESS_PREFIX,
+        check_interval: float = CHECK_INTERVAL,
+        scan_interval: float = SCAN_INTERVAL,
+    ):
+        self.prefix = prefix
+        self.check_interval = check_interval
+        self.scan_interval = scan_interval
+
+        # Reentrant: listeners run under it and may query the state
+        self._lock = threading.RLock()
+        self._tracked: Optional[Tuple[int, float]] = None  # pid, create_time
+        self._scanned_at = float("-inf")
+        self._listeners: List[Listener] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --------------------
+    # Public API
+    # --------------------
+
+    @property
+    def pid(self) -> Optional[int]:
+        tracked = self._tracked
+        return tracked[0] if tracked else None
+
+    def is_running(self) -> bool:
+        """Current state; scans only if the last scan is older than check_interval."""
+        with self._lock:
+            self._refresh(max_age=self.check_interval)
+            return self._tracked is not None
+
+    def subscribe(self, listener: Listener) -> Callable[[], None]:
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="process-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    # --------------------
+    # Internals
+    # --------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                self._refresh(max_age=self.scan_interval)
+                running = self._tracked is not None
+            self._stop.wait(self.check_interval if running else self.scan_interval)
+
+    def _refresh(self, max_age: float):
+        previous = self._tracked
+        if self._tracked and not self._alive(*self._tracked):
+            logger.info(f"Dota 2 (pid {self._tracked[0]}) exited")
+            self._tracked = None
+        if self._tracked is None and time.monotonic() - self._scanned_at >= max_age:
+            self._tracked = self._scan()
+            self._scanned_at = time.monotonic()
+
+        if self._tracked != previous:
+            if previous:
+                self._notify(False, previous[0])
+            if self._tracked:
+                self._notify(True, self._tracked[0])
+
+    def _alive(self, pid: int, create_time: float) -> bool:
+        try:
+            return psutil.Process(pid).create_time() == create_time
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+    def _scan(self) -> Optional[Tuple[int, float]]:
+        for proc in psutil.process_iter(["name", "create_time"]):
+            name = proc.info["name"]
+            if name and name.lower().startswith(self.prefix):
+                logger.info(f"Dota 2 is running (pid {proc.pid})")
+                return proc.pid, proc.info["create_time"]
+        return None
+
+    def _notify(self, running: bool, pid: Optional[int]):
+        for listener in list(self._listeners):
+            try:
+                listener(running, pid)
+            except Exception as e:
+                logger.error(f"Process listener failed: {e}")
+
+
+_watcher: Optional[ProcessWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_process_watcher() -> ProcessWatcher:
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ProcessWatcher()
+        return _watcher
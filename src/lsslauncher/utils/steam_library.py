@@ -0,0 +1,238 @@
+import json
+import os
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+from utils.helpers import get_folder
+
+DOTA_APP_ID = "570"
+DOTA_FOLDER = "dota 2 beta"
+LIBRARY_CACHE_PATH = Path(get_folder()) / "cache" / "steam_library.json"
+LIBRARY_WORKERS = 8
+LIBRARY_CHECK_TIMEOUT = 2.0  # for all libraries together, offline drives are skipped
+
+_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", '"': '"'}
+
+
+# --------------------
+# VDF
+# --------------------
+
+def _tokenize(text: str):
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end + 1
+        elif c in "{}":
+            yield c
+            i += 1
+        elif c == '"':
+            i += 1
+            chars = []
+            while i < n and text[i] != '"':
+                if text[i] == "\\" and i + 1 < n:
+                    chars.append(_ESCAPES.get(text[i + 1], text[i + 1]))
+                    i += 2
+                else:
+                    chars.append(text[i])
+                    i += 1
+            yield "".join(chars)
+            i += 1
+        else:
+            start = i
+            while i < n and not text[i].isspace() and text[i] not in '{}"':
+                i += 1
+            yield text[start:i]
+
+
+def parse_vdf(text: str) -> dict:
+    """Parses Valve KeyValues text (libraryfolders.vdf, appmanifest_*.acf)."""
+    root: dict = {}
+    stack = [root]
+    key: Optional[str] = None
+    for token in _tokenize(text):
+        if token == "{":
+            if key is None:
+                raise ValueError("VDF block without a key")
+            child: dict = {}
+            stack[-1][key] = child
+            stack.append(child)
+            key = None
+        elif token == "}":
+            if len(stack) == 1:
+                raise ValueError("Unbalanced '}' in VDF")
+            stack.pop()
+        elif key is None:
+            key = token
+        else:
+            stack[-1][key] = token
+            key = None
+    return root
+
+
+# --------------------
+# Discovery
+# --------------------
+
+def steam_roots() -> List[Path]:
+    system = platform.system()
+    if system == "Windows":
+        import winreg
+        roots = []
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Valve\Steam") as key:  # type: ignore
+                roots.append(Path(winreg.QueryValueEx(key, "SteamPath")[0]))  # type: ignore
+        except FileNotFoundError:
+            pass
+        roots.append(Path(os.path.expandvars(r"%ProgramFiles(x86)%\Steam")))
+        return roots
+    if system == "Darwin":
+        return [Path("~/Library/Application Support/Steam").expanduser()]
+    if system == "Linux":
+        return [
+            Path("~/.steam/steam").expanduser(),
+            Path("~/.local/share/Steam").expanduser(),
+        ]
+    return []
+
+
+def library_folders(vdf_path: Path) -> List[Path]:
+    """Libraries listed in libraryfolders.vdf, the ones holding Dota first."""
+    data = parse_vdf(vdf_path.read_text(encoding="utf-8", errors="ignore"))
+    section = next(iter(data.values()), {})  # "libraryfolders" / "LibraryFolders"
+
+    with_dota, others = [], []
+    for key, value in section.items():
+        if isinstance(value, dict):
+            # Current format: "0" { "path" "..." "apps" { "570" "..." } }
+            if "path" not in value:
+                continue
+            target = with_dota if DOTA_APP_ID in value.get("apps", {}) else others
+            target.append(Path(value["path"]))
+        elif key.isdigit():
+            # Old format: "1" "D:\\SteamLibrary"
+            others.append(Path(value))
+    return with_dota + others
+
+
+class SteamLibraryFinder:
+    """
+    Finds the Dota 2 folder across all Steam libraries. Libraries are
+    probed concurrently and the first hit in library order wins; a drive
+    that doesn't answer in time is skipped. The answer is cached (in memory and on disk) and reused until
+    libraryfolders.vdf changes or the folder disappears.
+    """
+
+    def __init__(self, cache_path: Path = LIBRARY_CACHE_PATH):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._memo: Optional[dict] = None
+
+    def find_dota(self) -> Optional[str]:
+        with self._lock:
+            roots = steam_roots()
+            key = self._cache_key(roots)
+            cached = self._load()
+            if cached and cached.get("key") == key:
+                path = cached.get("path")
+                if path is not None and os.path.isdir(path):
+                    return path
+
+            path = self._discover(roots)
+            self._save({"key": key, "path": path})
+            return path
+
+    def _discover(self, roots: List[Path]) -> Optional[str]:
+        candidates: List[Path] = []
+        for root in roots:
+            vdf_path = root / "steamapps" / "libraryfolders.vdf"
+            libraries = [root]
+            if vdf_path.exists():
+                try:
+                    libraries += library_folders(vdf_path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to parse {vdf_path}: {e}")
+            for library in libraries:
+                candidate = library / "steamapps" / "common" / DOTA_FOLDER
+                if candidate not in candidates:
+                    candidates.append(candidate)
+
+        if not candidates:
+            return None
+
+        pool = ThreadPoolExecutor(
+            max_workers=min(LIBRARY_WORKERS, len(candidates)),
+            thread_name_prefix="steam-library",
+        )
+        try:
+            futures = [(c, pool.submit(os.path.isdir, c)) for c in candidates]
+            # One deadline for all of them, so several offline drives
+            # don't add up
+            deadline = time.monotonic() + LIBRARY_CHECK_TIMEOUT
+            # Keep the vdf order (libraries listing app 570 first), not
+            # whichever drive happens to answer first
+            for candidate, future in futures:
+                try:
+                    timeout = max(deadline - time.monotonic(), 0)
+                    if not future.result(timeout=timeout):
+                        continue
+                except TimeoutError:
+                    logger.warning(f"{candidate} didn't respond, skipping it")
+                    continue
+                found = str(candidate.resolve())
+                logger.info(f"Dota 2 found at {found}")
+                return found
+        finally:
+            # Don't wait for drives that are still spinning up
+            pool.shutdown(wait=False, cancel_futures=True)
+        return None
+
+    @staticmethod
+    def _cache_key(roots: List[Path]) -> Dict[str, Optional[int]]:
+        key = {}
+        for root in roots:
+            vdf_path = root / "steamapps" / "libraryfolders.vdf"
+            try:
+                key[str(vdf_path)] = vdf_path.stat().st_mtime_ns
+            except OSError:
+                key[str(vdf_path)] = None
+        return key
+
+    def _load(self) -> Optional[dict]:
+        if self._memo is None:
+            try:
+                self._memo = json.loads(self.cache_path.read_text())
+            except (OSError, ValueError):
+                return None
+        return self._memo
+
+    def _save(self, data: dict):
+        self._memo = data
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data))
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to save Steam library cache: {e}")
+
+
+_finder: Optional[SteamLibraryFinder] = None
+_finder_lock = threading.Lock()
+
+
+def get_library_finder() -> SteamLibraryFinder:
+    global _finder
+    with _finder_lock:
+        if _finder is None:
+            _finder = SteamLibraryFinder()
+        return _finder
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import random
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+from utils.api import API
+from utils.async_api import AsyncAPI
+from utils.background_loop import get_background_loop
+
+INITIAL_DELAY = 0.5
+MAX_DELAY = 15.0
+TASK_TIMEOUT = 30 * 60
+TASK_EVENTS_ENDPOINT = "/task/{}/events"
+FAILED_STATES = {"failure", "failed", "error", "revoked"}
+FINAL_STATES = {"success", "done", "completed"} | FAILED_STATES
+
+
+class TaskFailedError(RuntimeError):
+    def __init__(self, task_id: str, payload: dict):
+        super().__init__(f"Task '{task_id}' failed: {payload.get('status')}")
+        self.payload = payload
+
+
+def _task_state(payload: dict) -> str:
+    return str(payload.get("status", "")).lower()
+
+
+def is_final(payload: dict) -> bool:
+    return _task_state(payload) in FINAL_STATES
+
+
+class _Watch:
+    __slots__ = ("task_id", "futures", "delay", "due", "deadline", "streaming")
+
+    def __init__(self, task_id: str, now: float, timeout: float):
+        self.task_id = task_id
+        self.futures: List[Future] = []
+        self.delay = INITIAL_DELAY
+        self.due = now
+        self.deadline = now + timeout
+        self.streaming = False
+
+
+class TaskWatcher:
+    """
+    Waits for server tasks (e.g. merge_pack) without a thread per task.
+    All watched tasks are polled from the shared background loop: the due
+    ones are checked together in one concurrent batch, and each task backs
+    off exponentially with jitter. With use_push the task event stream
+    (SSE) is tried first and polling only covers the gaps.
+    """
+
+    def __init__(
+        self,
+        api: API,
+        timeout: float = TASK_TIMEOUT,
+        use_push: bool = False,
+    ):
+        self.api = api
+        self.timeout = timeout
+        self.use_push = use_push
+
+        self._runner = get_background_loop()
+        self._watches: Dict[str, _Watch] = {}
+        self._client: Optional[AsyncAPI] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    # --------------------
+    # Public API (any thread)
+    # --------------------
+
+    def watch(
+        self,
+        task_id: str,
+        callback: Optional[Callable[[Future], None]] = None,
+    ) -> Future:
+        """
+        Returns a future resolved with the final task status payload.
+        It fails with TaskFailedError if the task ends in a failure state,
+        and with TimeoutError or LookupError if it never finishes or
+        doesn't exist.
+        """
+        future: Future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        self._runner.call(self._add, task_id, future)
+        return future
+
+    def close(self):
+        async def shutdown():
+            if self._poller:
+                self._poller.cancel()
+            if self._client:
+                await self._client.close()
+
+        self._runner.run(shutdown()).result()
+
+    # --------------------
+    # Background loop
+    # --------------------
+
+    def _add(self, task_id: str, future: Future):
+        watch = self._watches.get(task_id)
+        if watch is None:
+            watch = _Watch(task_id, self._runner.loop.time(), self.timeout)
+            self._watches[task_id] = watch
+            if self.use_push:
+                asyncio.create_task(self._listen(watch))
+        watch.futures.append(future)
+
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        self._wakeup.set()
+
+    def _get_client(self) -> AsyncAPI:
+        if self._client is None:
+            self._client = AsyncAPI()
+        # The sync API owns the session token, it may change after login
+        self._client.token = self.api.token
+        return self._client
+
+    async def _poll(self):
+        loop = self._runner.loop
+        while self._watches:
+            now = loop.time()
+            for watch in list(self._watches.values()):
+                if watch.streaming and now >= watch.deadline:
+                    error = TimeoutError(f"Task '{watch.task_id}' timed out")
+                    self._fail(watch, error)
+            due = [
+                w for w in self._watches.values() if not w.streaming and w.due <= now
+            ]
+            if due:
+                client = self._get_client()
+                results = await asyncio.gather(
+                    *(client.get_task_status(w.task_id) for w in due)
+                )
+                now = loop.time()
+                for watch, (status, payload) in zip(due, results):
+                    self._handle(watch, status, payload, now)
+
+            waits = [w.due for w in self._watches.values() if not w.streaming]
+            timeout = max(min(waits) - loop.time(), 0) if waits else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _handle(self, watch: _Watch, status: int, payload: dict, now: float):
+        if status == 200 and is_final(payload):
+            self._resolve(watch, payload)
+        elif status == 404:
+            self._fail(watch, LookupError(f"Task '{watch.task_id}' not found"))
+        elif now >= watch.deadline:
+            self._fail(watch, TimeoutError(f"Task '{watch.task_id}' timed out"))
+        else:
+            watch.delay = min(watch.delay * 2, MAX_DELAY)
+            # Jitter keeps many tasks started together from polling in lockstep
+            watch.due = now + random.uniform(watch.delay / 2, watch.delay)
+
+    def _resolve(self, watch: _Watch, payload: dict):
+        if _task_state(payload) in FAILED_STATES:
+            self._fail(watch, TaskFailedError(watch.task_id, payload))
+            return
+        self._watches.pop(watch.task_id, None)
+        logger.info(f"Task '{watch.task_id}' finished: {payload.get('status')}")
+        for future in watch.futures:
+            if not future.done():
+                future.set_result(payload)
+
+    def _fail(self, watch: _Watch, error: Exception):
+        self._watches.pop(watch.task_id, None)
+        logger.error(str(error))
+        for future in watch.futures:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _listen(self, watch: _Watch):
+        """Follows the task's SSE stream; polling resumes if it's unavailable."""
+        client = self._get_client()
+        endpoint = TASK_EVENTS_ENDPOINT.format(watch.task_id)
+        headers = client._auth_headers({"accept": "text/event-stream"})
+
+        watch.streaming = True
+        try:
+            async with client.client.stream(
+                "GET", endpoint, headers=headers, timeout=None
+            ) as response:
+                if response.status_code != 200:
+                    # The server has no event stream, stop trying for new tasks
+                    logger.info("Task push is not available, polling instead")
+                    self.use_push = False
+                    return
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = json.loads(line[5:])
+                    if is_final(payload):
+                        self._resolve(watch, payload)
+                        return
+        except Exception as exc:
+            logger.info(f"Push for task '{watch.task_id}' failed ({exc}), polling")
+        finally:
+            watch.streaming = False
+            if self._wakeup:
+                self._wakeup.set()
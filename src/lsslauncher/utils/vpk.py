@@ -0,0 +1,360 @@
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Set, Union
+
+from loguru import logger
+
+VPK_SIGNATURE = 0x55AA1234
+EMBEDDED_ARCHIVE = 0x7FFF  # entry data lives in the _dir.vpk itself
+ENTRY_TERMINATOR = 0xFFFF
+
+HEADER_V1 = struct.Struct("<III")  # signature, version, tree size
+HEADER_V2 = struct.Struct("<IIIIIII")  # + data, archive md5, other md5, signature sizes
+ENTRY = struct.Struct("<IHHIIH")  # crc, preload, archive, offset, length, terminator
+
+
+class VPKError(Exception):
+    pass
+
+
+class VPKEntry:
+    __slots__ = (
+        "path",
+        "crc",
+        "preload_offset",
+        "preload_size",
+        "archive_index",
+        "offset",
+        "length",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        crc: int,
+        preload_offset: int,
+        preload_size: int,
+        archive_index: int,
+        offset: int,
+        length: int,
+    ):
+        self.path = path
+        self.crc = crc
+        self.preload_offset = preload_offset
+        self.preload_size = preload_size
+        self.archive_index = archive_index
+        self.offset = offset
+        self.length = length
+
+    @property
+    def size(self) -> int:
+        return self.preload_size + self.length
+
+    def __repr__(self) -> str:
+        return (
+            f"VPKEntry({self.path!r}, size={self.size}, crc={self.crc:08x}, "
+            f"archive={self.archive_index}, offset={self.offset})"
+        )
+
+
+class VPK:
+    """
+    Read-only Valve pack (v1/v2). The directory file is memory mapped and
+    its tree is indexed once (path -> archive, offset, size, CRC), so
+    listing, overlap checks and reading or verifying one entry never
+    touch the rest of the archive.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._archives: Dict[int, mmap.mmap] = {}
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+            self.entries: Dict[str, VPKEntry] = {}
+            self._parse_tree()
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise VPKError(f"{self.path.name} is not a valid VPK: {e}") from e
+        except VPKError:
+            self.close()
+            raise
+        logger.debug(f"Indexed {len(self.entries)} entries of {self.path.name}")
+
+    # --------------------
+    # Parsing
+    # --------------------
+
+    def _parse_header(self):
+        signature, self.version, self.tree_size = HEADER_V1.unpack_from(self._mm, 0)
+        if signature != VPK_SIGNATURE:
+            raise VPKError(f"{self.path.name} has no VPK signature")
+        if self.version == 1:
+            self.header_size = HEADER_V1.size
+            self.data_size = 0
+            self.archive_md5_size = self.other_md5_size = self.signature_size = 0
+        elif self.version == 2:
+            (
+                _,
+                _,
+                _,
+                self.data_size,
+                self.archive_md5_size,
+                self.other_md5_size,
+                self.signature_size,
+            ) = HEADER_V2.unpack_from(self._mm, 0)
+            self.header_size = HEADER_V2.size
+        else:
+            raise VPKError(f"Unsupported VPK version {self.version}")
+        # Embedded entry offsets are relative to the end of the tree
+        self.data_offset = self.header_size + self.tree_size
+
+    def _read_string(self, pos: int) -> tuple[str, int]:
+        end = self._mm.find(b"\x00", pos, self.data_offset)
+        if end == -1:
+            raise VPKError("Unterminated string in directory tree")
+        return self._mm[pos:end].decode("utf-8", errors="replace"), end + 1
+
+    def _parse_tree(self):
+        pos = self.header_size
+        while True:
+            extension, pos = self._read_string(pos)
+            if not extension:
+                break
+            while True:
+                directory, pos = self._read_string(pos)
+                if not directory:
+                    break
+                while True:
+                    name, pos = self._read_string(pos)
+                    if not name:
+                        break
+                    crc, preload, archive, offset, length, terminator = ENTRY.unpack_from(
+                        self._mm, pos
+                    )
+                    if terminator != ENTRY_TERMINATOR:
+                        raise VPKError(f"Bad entry terminator at {pos}")
+                    pos += ENTRY.size
+                    path = self._join(directory, name, extension)
+                    self.entries[path] = VPKEntry(
+                        path, crc, pos, preload, archive, offset, length
+                    )
+                    pos += preload
+
+    @staticmethod
+    def _join(directory: str, name: str, extension: str) -> str:
+        # A single space stands for "none" in the tree
+        filename = name if extension == " " else f"{name}.{extension}"
+        return filename if directory == " " else f"{directory}/{filename}"
+
+    # --------------------
+    # Index
+    # --------------------
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries
+
+    def __iter__(self) -> Iterator[VPKEntry]:
+        return iter(self.entries.values())
+
+    def get(self, path: str) -> Optional[VPKEntry]:
+        return self.entries.get(path)
+
+    def overlap(self, other: "VPK") -> Set[str]:
+        """Paths present in both packs, i.e. the assets a merge must choose for."""
+        small, large = sorted((self.entries, other.entries), key=len)
+        return {path for path in small if path in large}
+
+    # --------------------
+    # Data
+    # --------------------
+
+    def read(self, path: str) -> bytes:
+        entry = self.entries[path]
+        return bytes(self.preload(entry)) + bytes(self.data(entry))
+
+    def preload(self, entry: VPKEntry) -> memoryview:
+        start = entry.preload_offset
+        return memoryview(self._mm)[start : start + entry.preload_size]
+
+    def data(self, entry: VPKEntry) -> memoryview:
+        """Zero-copy view of the archive part of an entry."""
+        if not entry.length:
+            return memoryview(b"")
+        if entry.archive_index == EMBEDDED_ARCHIVE:
+            archive, start = self._mm, self.data_offset + entry.offset
+        else:
+            archive, start = self._archive(entry.archive_index), entry.offset
+        if start + entry.length > len(archive):
+            raise VPKError(f"Entry {entry.path} points past the end of its archive")
+        return memoryview(archive)[start : start + entry.length]
+
+    def verify(self, path: str) -> bool:
+        entry = self.entries[path]
+        crc = zlib.crc32(self.preload(entry))
+        crc = zlib.crc32(self.data(entry), crc)
+        return crc & 0xFFFFFFFF == entry.crc
+
+    def _archive(self, index: int) -> mmap.mmap:
+        archive = self._archives.get(index)
+        if archive is None:
+            name = self.path.name
+            if not name.endswith("_dir.vpk"):
+                raise VPKError(f"{name} has no numbered archives")
+            archive_path = self.path.with_name(f"{name[:-len('_dir.vpk')]}_{index:03d}.vpk")
+            with open(archive_path, "rb") as f:
+                archive = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._archives[index] = archive
+        return archive
+
+    # --------------------
+    # Cleanup
+    # --------------------
+
+    def close(self):
+        for archive in self._archives.values():
+            archive.close()
+        self._archives.clear()
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> "VPK":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pack_overlap(main_path: Union[str, Path], second_path: Union[str, Path]) -> Set[str]:
+    """Assets two packs both replace; empty means they can be mixed losslessly."""
+    with VPK(main_path) as main, VPK(second_path) as second:
+        return main.overlap(second)
+
+
+# --------------------
+# Merging
+# --------------------
+
+OTHER_MD5 = struct.Struct("<16s16s16s")  # tree, archive md5 section, whole file
+MAX_EMBEDDED_DATA = 0xFFFFFFFF
+WRITE_CHUNK = 8 * 1024 * 1024
+
+
+def _split_path(path: str) -> tuple[str, str, str]:
+    directory, _, filename = path.rpartition("/")
+    name, dot, extension = filename.rpartition(".")
+    if not dot or not name:
+        name, extension = filename, " "
+    return directory or " ", name, extension
+
+
+def _build_tree(entries: list[tuple[VPK, VPKEntry]], offsets: Dict[str, int]) -> bytes:
+    grouped: Dict[str, Dict[str, list[tuple[str, VPK, VPKEntry]]]] = {}
+    for source, entry in entries:
+        directory, name, extension = _split_path(entry.path)
+        grouped.setdefault(extension, {}).setdefault(directory, []).append(
+            (name, source, entry)
+        )
+
+    tree = bytearray()
+    for extension, directories in grouped.items():
+        tree += extension.encode() + b"\x00"
+        for directory, files in directories.items():
+            tree += directory.encode() + b"\x00"
+            for name, source, entry in files:
+                tree += name.encode() + b"\x00"
+                tree += ENTRY.pack(
+                    entry.crc,
+                    entry.preload_size,
+                    EMBEDDED_ARCHIVE,
+                    offsets[entry.path],
+                    entry.length,
+                    ENTRY_TERMINATOR,
+                )
+                tree += source.preload(entry)
+            tree += b"\x00"
+        tree += b"\x00"
+    tree += b"\x00"
+    return bytes(tree)
+
+
+def _copy_view(view: memoryview, out, digest):
+    # Views must not outlive this call, the source mmap can't close with them
+    with view:
+        for start in range(0, len(view), WRITE_CHUNK):
+            chunk = view[start : start + WRITE_CHUNK]
+            out.write(chunk)
+            digest.update(chunk)
+            chunk.release()
+
+
+def merge_vpks(
+    main_path: Union[str, Path],
+    second_path: Union[str, Path],
+    output_path: Union[str, Path],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Writes a single-file VPK v2 holding every entry of both packs; on a
+    conflict the main pack wins. Entry data is streamed straight from the
+    mapped sources and written once, followed by the MD5 sections.
+    Returns the number of overridden entries.
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+
+    with VPK(main_path) as main, VPK(second_path) as second:
+        entries = [(main, entry) for entry in main]
+        entries += [(second, entry) for entry in second if entry.path not in main]
+        overridden = len(second) - (len(entries) - len(main))
+
+        offsets: Dict[str, int] = {}
+        data_size = 0
+        for _, entry in entries:
+            offsets[entry.path] = data_size
+            data_size += entry.length
+        if data_size > MAX_EMBEDDED_DATA:
+            raise VPKError("Merged pack is too large for a single VPK file")
+
+        tree = _build_tree(entries, offsets)
+        header = HEADER_V2.pack(
+            VPK_SIGNATURE, 2, len(tree), data_size, 0, OTHER_MD5.size, 0
+        )
+
+        whole = hashlib.md5(header)
+        whole.update(tree)
+        written = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                out.write(header)
+                out.write(tree)
+                for source, entry in entries:
+                    _copy_view(source.data(entry), out, whole)
+                    written += entry.length
+                    if on_progress:
+                        on_progress(written, data_size)
+
+                tree_md5 = hashlib.md5(tree).digest()
+                archive_md5 = hashlib.md5(b"").digest()  # no archive md5 entries
+                whole.update(tree_md5 + archive_md5)
+                out.write(OTHER_MD5.pack(tree_md5, archive_md5, whole.digest()))
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    os.replace(tmp_path, output_path)
+    logger.success(
+        f"Merged {main.path.name} + {second.path.name}: {len(entries)} entries, "
+        f"{overridden} overridden by the main pack"
+    )
+    return overridden
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src" / "lsslauncher"))
+
+
+def block_manifest(url: str, data: bytes, block_size: int) -> dict:
+    """What /files/{id}/blocks returns for `data`."""
+    return {
+        "url": url,
+        "size": len(data),
+        "md5": hashlib.md5(data).hexdigest(),
+        "block_size": block_size,
+        "blocks": [
+            hashlib.md5(data[i : i + block_size]).hexdigest()
+            for i in range(0, len(data), block_size)
+        ],
+    }
+
+
+class RangeServer:
+    """
+    Local stand-in for the pack server, on its own loop and thread:
+    serves byte ranges of in-memory files under /data/<name> and block
+    manifests under /files/<id>/blocks.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self.manifests: Dict[int, dict] = {}
+        # Range header of every /data request, None for a plain GET
+        self.requests: List[Optional[str]] = []
+        # The first range starting at or past this offset is cut off
+        # halfway, every later one is answered with 404
+        self.fail_from: Optional[int] = None
+        # Status every ranged request is answered with, if set
+        self.range_status: Optional[int] = None
+        self._cut = False
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def add_file(self, name: str, data: bytes, file_id: int, block_size: int) -> dict:
+        self.files[name] = data
+        manifest = block_manifest(self.url(f"/data/{name}"), data, block_size)
+        self.manifests[file_id] = manifest
+        return manifest
+
+    def requested_bytes(self) -> int:
+        """Bytes asked for by ranged requests, not counting range probes."""
+        total = 0
+        for header in self.requests:
+            if header in (None, "bytes=0-0"):
+                continue
+            start, end = header.split("=")[1].split("-")
+            total += int(end) - int(start) + 1
+        return total
+
+    # --------------------
+    # Lifecycle
+    # --------------------
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/data/{name}", self._data)
+        app.router.add_get("/files/{file_id}/blocks", self._blocks)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{host}:{port}"
+
+    # --------------------
+    # Handlers
+    # --------------------
+
+    async def _data(self, request: web.Request) -> web.StreamResponse:
+        data = self.files.get(request.match_info["name"])
+        if data is None:
+            raise web.HTTPNotFound()
+
+        header = request.headers.get("Range")
+        self.requests.append(header)
+        if header is None:
+            return web.Response(body=data)
+        if self.range_status is not None:
+            return web.Response(status=self.range_status)
+
+        start, end = (int(v) for v in header.split("=")[1].split("-"))
+        end = min(end, len(data) - 1)
+        if self.fail_from is not None and start >= self.fail_from:
+            if self._cut:
+                raise web.HTTPNotFound()
+            self._cut = True
+            return await self._cut_short(request, data, start, end)
+
+        return web.Response(
+            status=206,
+            body=data[start : end + 1],
+            headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"},
+        )
+
+    async def _cut_short(self, request, data: bytes, start: int, end: int):
+        resp = web.StreamResponse(
+            status=206,
+            headers={
+                "Content-Range": f"bytes {start}-{end}/{len(data)}",
+                "Content-Length": str(end - start + 1),
+            },
+        )
+        await resp.prepare(request)
+        await resp.write(data[start : start + (end - start + 1) // 2])
+        request.transport.close()
+        return resp
+
+    async def _blocks(self, request: web.Request) -> web.Response:
+        manifest = self.manifests.get(int(request.match_info["file_id"]))
+        if manifest is None:
+            raise web.HTTPNotFound()
+        return web.json_response(manifest)
+
+
+@pytest.fixture
+def range_server():
+    server = RangeServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Pack store in tmp_path, with API downloads landing in its packs dir."""
+    import utils.api
+    import utils.download
+    import utils.pack_store
+
+    packs = tmp_path / "packs"
+    store = utils.pack_store.PackStore(tmp_path / "store", packs)
+    monkeypatch.setattr(utils.pack_store, "_store", store)
+    monkeypatch.setattr(utils.pack_store, "installed_pack", lambda: None)
+    monkeypatch.setattr(utils.api, "APP_DATA_PATH", packs)
+    monkeypatch.setattr(utils.download, "RETRY_BACKOFF", 0.01)
+    return store
+
+
+@pytest.fixture
+def api(range_server):
+    import httpx
+    from utils.api import API
+
+    api = API()
+    api.client.close()
+    api.client = httpx.Client(base_url=range_server.base_url)
+    yield api
+    api.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def background_loop():
+    yield
+    import utils.background_loop
+
+    # Stop it while pytest still captures output, not from atexit
+    if utils.background_loop._background_loop is not None:
+        utils.background_loop._background_loop.stop()
@@ -0,0 +1,166 @@
+import json
+import os
+import random
+
+import pytest
+
+from utils.delta import changed_ranges, prepare_delta, verify_ranges
+from utils.pack_store import PackStore
+
+from tests.conftest import block_manifest
+
+KB = 1024
+MB = 1024 * KB
+BLOCK = 64 * KB
+
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def patched(data: bytes, start: int, end: int, seed: int) -> bytes:
+    return data[:start] + random_bytes(end - start, seed) + data[end:]
+
+
+# --------------------
+# delta helpers
+# --------------------
+
+
+def test_changed_ranges_merges_adjacent_blocks(tmp_path):
+    old = random_bytes(10 * BLOCK, 1)
+    new = patched(old, 2 * BLOCK, 4 * BLOCK, 2)
+    new = patched(new, 7 * BLOCK + 10, 7 * BLOCK + 20, 3)
+    path = tmp_path / "pack"
+    path.write_bytes(old)
+
+    ranges = changed_ranges(path, block_manifest("", new, BLOCK))
+
+    assert ranges == [(2 * BLOCK, 4 * BLOCK - 1), (7 * BLOCK, 8 * BLOCK - 1)]
+
+
+def test_changed_ranges_covers_growth_and_short_tail(tmp_path):
+    old = random_bytes(3 * BLOCK + 100, 1)
+    new = old[:3 * BLOCK] + random_bytes(BLOCK + 50, 2)
+    path = tmp_path / "pack"
+    path.write_bytes(old)
+
+    ranges = changed_ranges(path, block_manifest("", new, BLOCK))
+
+    assert ranges == [(3 * BLOCK, len(new) - 1)]
+
+
+def test_changed_ranges_empty_when_identical(tmp_path):
+    data = random_bytes(5 * BLOCK + 7, 1)
+    path = tmp_path / "pack"
+    path.write_bytes(data)
+
+    assert changed_ranges(path, block_manifest("", data, BLOCK)) == []
+
+
+def test_prepare_delta_copies_and_resizes(tmp_path):
+    old = random_bytes(6 * BLOCK, 1)
+    new = patched(old, BLOCK, 2 * BLOCK, 2)[: 5 * BLOCK]
+    source, work = tmp_path / "pack", tmp_path / "pack.delta"
+    source.write_bytes(old)
+
+    ranges = prepare_delta(source, work, block_manifest("", new, BLOCK))
+
+    assert ranges == [(BLOCK, 2 * BLOCK - 1)]
+    assert source.read_bytes() == old
+    assert os.path.getsize(work) == len(new)
+
+
+def test_prepare_delta_keeps_interrupted_work(tmp_path):
+    old = random_bytes(6 * BLOCK, 1)
+    new = patched(old, 0, 4 * BLOCK, 2)
+    manifest = block_manifest("", new, BLOCK)
+    source, work = tmp_path / "pack", tmp_path / "pack.delta"
+    source.write_bytes(old)
+    prepare_delta(source, work, manifest)
+
+    # Half of the patch landed before the download was interrupted
+    with open(work, "r+b") as f:
+        f.write(new[: 2 * BLOCK])
+    (tmp_path / "pack.delta.meta").write_text("{}")
+
+    assert prepare_delta(source, work, manifest) == [(2 * BLOCK, 4 * BLOCK - 1)]
+
+    # Without the .meta the work file is started over from the source
+    os.remove(tmp_path / "pack.delta.meta")
+    assert prepare_delta(source, work, manifest) == [(0, 4 * BLOCK - 1)]
+
+
+def test_verify_ranges(tmp_path):
+    new = random_bytes(4 * BLOCK, 1)
+    manifest = block_manifest("", new, BLOCK)
+    path = tmp_path / "pack"
+    path.write_bytes(new)
+    ranges = [(BLOCK, 3 * BLOCK - 1)]
+
+    assert verify_ranges(path, manifest, ranges)
+
+    path.write_bytes(patched(new, 2 * BLOCK + 5, 2 * BLOCK + 6, 2))
+    assert not verify_ranges(path, manifest, ranges)
+    # Blocks outside the patched ranges are trusted, they already matched
+    assert verify_ranges(path, manifest, [(0, BLOCK - 1)])
+
+    path.write_bytes(new[:-1])
+    assert not verify_ranges(path, manifest, ranges)
+
+
+# --------------------
+# API._submit_delta
+# --------------------
+
+
+def seed_pack(store: PackStore, tmp_path, name: str, data: bytes):
+    source = tmp_path / f"{name}.seed"
+    source.write_bytes(data)
+    store.add(name, source)
+
+
+def test_submit_delta_fetches_only_changed_blocks(tmp_path, store, api, range_server):
+    old = random_bytes(4 * MB, 1)
+    new = patched(old, MB, MB + 3 * BLOCK, 2)
+    new = patched(new, 3 * MB, 3 * MB + BLOCK, 3)
+    seed_pack(store, tmp_path, "delta-pack", old)
+    manifest = range_server.add_file("delta-pack", new, 1, BLOCK)
+
+    job = api.submit_download("unused", "delta-pack", manifest["md5"], file_id=1)
+    job.wait(timeout=30)
+
+    assert (tmp_path / "packs" / "delta-pack").read_bytes() == new
+    assert store.digest("delta-pack") == manifest["md5"]
+    assert range_server.requested_bytes() == 4 * BLOCK
+    assert not (tmp_path / "packs" / "delta-pack.delta").exists()
+    assert not (tmp_path / "packs" / "delta-pack.delta.meta").exists()
+
+
+def test_submit_delta_resumes_from_meta(tmp_path, store, api, range_server):
+    old = random_bytes(4 * MB, 1)
+    new = patched(old, 0, 3 * MB, 2)
+    seed_pack(store, tmp_path, "resumed-pack", old)
+    manifest = range_server.add_file("resumed-pack", new, 2, BLOCK)
+    meta_path = tmp_path / "packs" / "resumed-pack.delta.meta"
+
+    # The last 1 MB part is cut off halfway, then refused
+    range_server.fail_from = 2 * MB
+    job = api.submit_download("unused", "resumed-pack", manifest["md5"], file_id=2)
+    with pytest.raises(RuntimeError):
+        job.wait(timeout=30)
+
+    parts = json.loads(meta_path.read_text())["parts"]
+    written = sum(part["written"] for part in parts)
+    assert written == 2 * MB + MB // 2
+    assert (tmp_path / "packs" / "resumed-pack").read_bytes() == old
+
+    range_server.fail_from = None
+    range_server.requests.clear()
+    job = api.submit_download("unused", "resumed-pack", manifest["md5"], file_id=2)
+    job.wait(timeout=30)
+
+    assert range_server.requests[-1] == f"bytes={2 * MB + MB // 2}-{3 * MB - 1}"
+    assert range_server.requested_bytes() == 3 * MB - written
+    assert (tmp_path / "packs" / "resumed-pack").read_bytes() == new
+    assert not meta_path.exists()
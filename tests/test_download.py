@@ -0,0 +1,133 @@
+import asyncio
+import gzip
+import json
+import random
+
+import pytest
+
+KB = 1024
+MB = 1024 * KB
+
+
+def gz_pack(size: int, seed: int):
+    data = random.Random(seed).randbytes(size)
+    return data, gzip.compress(data, compresslevel=1)
+
+
+def md5(data: bytes) -> str:
+    import hashlib
+
+    return hashlib.md5(data).hexdigest()
+
+
+# --------------------
+# API.submit_download (.gz through GzipSink)
+# --------------------
+
+
+def test_submit_download_inflates_multipart_gz(tmp_path, store, api, range_server):
+    data, gz = gz_pack(10 * MB, 1)
+    range_server.files["gz-pack"] = gz
+
+    job = api.submit_download(range_server.url("/data/gz-pack"), "gz-pack", md5(data))
+    job.wait(timeout=30)
+
+    packs = tmp_path / "packs"
+    assert (packs / "gz-pack").read_bytes() == data
+    assert store.digest("gz-pack") == md5(data)
+    # Fetched as ranges, not as a single download
+    assert None not in range_server.requests
+    assert range_server.requested_bytes() == len(gz)
+    assert not (packs / "gz-pack.gz").exists()
+    assert not (packs / "gz-pack.gz.meta").exists()
+    assert not (packs / "gz-pack.tmp").exists()
+
+
+def test_submit_download_resumes_gz_from_meta(tmp_path, store, api, range_server):
+    data, gz = gz_pack(10 * MB, 2)
+    range_server.files["gz-resumed"] = gz
+    packs = tmp_path / "packs"
+    meta_path = packs / "gz-resumed.gz.meta"
+
+    # The first range past 5 MB is cut off halfway, later ones are refused
+    range_server.fail_from = 5 * MB
+    job = api.submit_download(range_server.url("/data/gz-resumed"), "gz-resumed", md5(data))
+    with pytest.raises(RuntimeError):
+        job.wait(timeout=30)
+
+    parts = json.loads(meta_path.read_text())["parts"]
+    written = sum(part["written"] for part in parts)
+    assert 0 < written < len(gz)
+    assert (packs / "gz-resumed.gz").exists()
+    assert not (packs / "gz-resumed").exists()
+
+    range_server.fail_from = None
+    range_server.requests.clear()
+    job = api.submit_download(range_server.url("/data/gz-resumed"), "gz-resumed", md5(data))
+    job.wait(timeout=30)
+
+    # Only the missing bytes are fetched, the rest is re-inflated from disk
+    assert range_server.requested_bytes() == len(gz) - written
+    assert (packs / "gz-resumed").read_bytes() == data
+    assert store.digest("gz-resumed") == md5(data)
+    assert not meta_path.exists()
+    assert not (packs / "gz-resumed.gz").exists()
+
+
+@pytest.mark.parametrize("status", [403, 405, 416])
+def test_submit_download_falls_back_when_ranges_are_refused(
+    tmp_path, store, api, range_server, status
+):
+    data, gz = gz_pack(3 * MB, 3)
+    range_server.files["gz-single"] = gz
+    range_server.range_status = status
+
+    job = api.submit_download(range_server.url("/data/gz-single"), "gz-single", md5(data))
+    job.wait(timeout=30)
+
+    # Probe refused, then one plain GET
+    assert range_server.requests == ["bytes=0-0", None]
+    assert (tmp_path / "packs" / "gz-single").read_bytes() == data
+
+
+# --------------------
+# Downloader scheduling
+# --------------------
+
+
+def test_lowering_connections_keeps_remaining_parts(tmp_path, range_server):
+    from utils.background_loop import get_background_loop
+    from utils.download import DownloadConfig, Downloader
+
+    data = random.Random(4).randbytes(16 * MB)
+    range_server.files["many-parts"] = data
+    config = DownloadConfig(
+        initial_connections=4, min_part_size=MB, max_part_size=MB, adapt_interval=3600
+    )
+    target = tmp_path / "many-parts"
+
+    async def run():
+        d = Downloader(range_server.url("/data/many-parts"), str(target), config=config)
+        fetch, release = d._fetch_part, asyncio.Event()
+
+        async def fetch_together(session, part):
+            written = await fetch(session, part)
+            await release.wait()
+            return written
+
+        async def lower_connections():
+            await asyncio.sleep(0.5)
+            # What the controller does after a throughput drop; every
+            # worker then finishes its range in the same loop iteration
+            d._target_connections = 1
+            release.set()
+
+        d._fetch_part = fetch_together
+        lower = asyncio.create_task(lower_connections())
+        async for _ in d.download():
+            pass
+        await lower
+
+    get_background_loop().run(run()).result(timeout=30)
+
+    assert target.read_bytes() == data